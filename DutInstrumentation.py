@@ -0,0 +1,187 @@
+import argparse
+import csv
+import os
+import re
+import sys
+
+from PerformanceHistory import DEFAULT_HISTORY_FILE, PROVENANCE_FIELDS, record_run
+
+# This script adds performance counters of the DUT to the generated testbenches and summarizes the reports they write
+
+INSTRUMENTATION_TEMPLATE = """
+    -- Performance counters: clock cycles from tb_start to tb_done, memory reads and writes issued by
+    -- the component and cycles between its output writes, written to the report file when tb_done rises.
+    performance_counters : process
+        file report_file : text open write_mode is "{report_file}";
+        variable cycles, reads, writes, output_writes : integer := 0;
+        variable first_output, last_output : integer := -1;
+        variable min_interval : integer := integer'high;
+        variable max_interval : integer := 0;
+
+        procedure write_text(text : string) is
+            variable report_line : line;
+        begin
+            write(report_line, text);
+            writeline(report_file, report_line);
+        end procedure;
+
+        procedure write_metric(name : string; value : integer) is
+        begin
+            write_text(name & "=" & integer'image(value));
+        end procedure;
+    begin
+        wait until rising_edge(tb_start);
+
+        while tb_done /= '1' loop
+            wait until rising_edge(tb_clk);
+            cycles := cycles + 1;
+            if exc_o_mem_en = '1' and exc_o_mem_we = '0' then
+                reads := reads + 1;
+            elsif exc_o_mem_en = '1' and exc_o_mem_we = '1' then
+                writes := writes + 1;
+                if to_integer(unsigned(exc_o_mem_addr)) >= SCENARIO_ADDRESS+17+SCENARIO_LENGTH then
+                    if output_writes > 0 then
+                        if cycles - last_output < min_interval then
+                            min_interval := cycles - last_output;
+                        end if;
+                        if cycles - last_output > max_interval then
+                            max_interval := cycles - last_output;
+                        end if;
+                    else
+                        first_output := cycles;
+                    end if;
+                    last_output := cycles;
+                    output_writes := output_writes + 1;
+                end if;
+            end if;
+        end loop;
+
+{provenance}        write_metric("s", scenario_config(2));
+        write_metric("scenario_length", SCENARIO_LENGTH);
+        write_metric("cycles", cycles);
+        write_metric("reads", reads);
+        write_metric("writes", writes);
+        write_metric("output_writes", output_writes);
+        write_metric("first_output_cycle", first_output);
+        write_metric("last_output_cycle", last_output);
+        write_metric("min_output_interval", min_interval);
+        write_metric("max_output_interval", max_interval);
+        write_metric("clock_period_ps", CLOCK_PERIOD / 1 ps);
+        wait;
+    end process;
+"""
+
+
+def instrumentation_process(report_file=None, provenance=None):
+    """
+    Return the VHDL process to insert in the testbench architecture, or an empty string without a report file.
+    The report path is made absolute and its directory created now: the simulator runs in a temporary work directory.
+    The provenance of the testbench (see PerformanceHistory.PROVENANCE_FIELDS) is copied into the report.
+    """
+    if report_file is None:
+        return ""
+    report_file = os.path.abspath(report_file)
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+    provenance_lines = []
+    for key, value in (provenance or {}).items():
+        if value is not None:
+            text = f"{key}={value}".replace('"', '""')
+            provenance_lines.append(f'        write_text("{text}");\n')
+    return INSTRUMENTATION_TEMPLATE.format(report_file=report_file.replace('"', '""'), provenance="".join(provenance_lines))
+
+
+def read_performance_report(report_file):
+    """Read a report written by the instrumented testbench and add the derived per-sample measurements."""
+    report = {"report": report_file}
+    with open(report_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if "=" in line:
+                name, value = line.strip().split("=", 1)
+                # The provenance stays text, a workbook hash or a template version may be all digits
+                if name not in PROVENANCE_FIELDS and re.fullmatch(r"-?\d+", value):
+                    value = int(value)
+                report[name] = value
+
+    report["cycles_per_sample"] = report["cycles"] / report["scenario_length"]
+    report["accesses_per_sample"] = (report["reads"] + report["writes"]) / report["scenario_length"]
+    if report["output_writes"] > 1:
+        report["mean_output_interval"] = ((report["last_output_cycle"] - report["first_output_cycle"])
+                                          / (report["output_writes"] - 1))
+    else:
+        report["mean_output_interval"] = float("nan")
+        report["min_output_interval"] = -1
+    report["run_time_us"] = report["cycles"] * report["clock_period_ps"] / 1e6
+    return report
+
+
+def summarize_reports(report_files):
+    """Read every report, print one line per scenario and the totals per filter order, and return the reports."""
+    reports = []
+    for report_file in report_files:
+        try:
+            reports.append(read_performance_report(report_file))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Could not read performance report {report_file}: {str(e)}")
+
+    width = max([len(os.path.basename(r["report"])) for r in reports] + [len("Report")])
+    print(f"{'Report'.ljust(width)}  S  {'Samples':>7}  {'Cycles':>9}  {'Reads':>8}  {'Writes':>8}  "
+          f"{'Cyc/sample':>10}  {'Interval min/mean/max':>22}")
+    for r in reports:
+        interval = f"{r['min_output_interval']}/{r['mean_output_interval']:.2f}/{r['max_output_interval']}"
+        print(f"{os.path.basename(r['report']).ljust(width)}  {r['s']}  {r['scenario_length']:>7}  {r['cycles']:>9}  "
+              f"{r['reads']:>8}  {r['writes']:>8}  {r['cycles_per_sample']:>10.3f}  {interval:>22}")
+
+    for s in sorted({r["s"] for r in reports}):
+        order = [r for r in reports if r["s"] == s]
+        samples = sum(r["scenario_length"] for r in order)
+        cycles = sum(r["cycles"] for r in order)
+        print(f"S={s}: {len(order)} scenario(s), {samples} samples in {cycles} cycles, "
+              f"{cycles / samples:.3f} cycles/sample, {samples / cycles:.4f} samples/cycle")
+    return reports
+
+
+def write_reports_csv(reports, csv_file):
+    """Append the reports to a CSV file, writing the header when the file is new."""
+    fields = ["report", "s", "scenario_length", "cycles", "reads", "writes", "output_writes", "first_output_cycle",
+              "last_output_cycle", "min_output_interval", "max_output_interval", "mean_output_interval",
+              "cycles_per_sample", "accesses_per_sample", "clock_period_ps", "run_time_us"]
+    new_file = not os.path.exists(csv_file)
+    with open(csv_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        writer.writerows(reports)
+    print(f"Performance reports appended to {csv_file}")
+
+
+def record_reports(history_file, reports, label=None):
+    """
+    Append the DUT counters of every report to the performance history, keyed by the workbook, workbook hash
+    and template version of the testbench that wrote the report.
+    """
+    metrics = ("cycles", "reads", "writes", "cycles_per_sample", "max_output_interval")
+    for r in reports:
+        record_run(history_file, "dut", r.get("workbook", os.path.basename(r["report"])), {name: r[name] for name in metrics},
+                   r.get("workbook_hash"), r.get("template_version"), r["s"], label)
+    print(f"{len(reports)} report(s) recorded in {history_file}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the performance reports of instrumented testbenches")
+    parser.add_argument("reports", nargs="+", help="report files written by the simulations")
+    parser.add_argument("--csv", default=None, help="append the reports to this CSV file")
+    parser.add_argument("--history", nargs="?", const=DEFAULT_HISTORY_FILE, default=None,
+                        help="record the counters in the performance history (SQLite file)")
+    parser.add_argument("--history-label", default=None, help="label of the recorded runs, e.g. a commit id")
+    args = parser.parse_args(argv)
+
+    reports = summarize_reports(args.reports)
+    if args.csv is not None and reports:
+        write_reports_csv(reports, args.csv)
+    if args.history is not None and reports:
+        record_reports(args.history, reports, args.history_label)
+    return 0 if len(reports) == len(args.reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
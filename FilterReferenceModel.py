@@ -0,0 +1,43 @@
+import numpy as np
+
+# This script computes the expected output of the differential filter, to regenerate testbenches on data not taken from the Excel file
+
+FILTER_LENGTH = 7           # Coefficients per filter order: C1-C7 for S=0, C8-C14 for S=1
+FILTER_RADIUS = 3           # The output at i depends on the inputs from i-3 to i+3
+
+# S -> right shifts approximating the normalisation (1/12 for the 3rd order, 1/60 for the 5th order)
+NORMALIZATION_SHIFTS = {0: (4, 6, 8, 10), 1: (6, 10)}
+
+
+def to_signed(values):
+    """Interpret memory bytes (0-255) as 8-bit two's complement numbers."""
+    values = np.asarray(values, dtype=np.int64)
+    return np.where(values > 127, values - 256, values)
+
+
+def to_unsigned(values):
+    """Turn 8-bit two's complement numbers back into memory bytes (0-255)."""
+    return np.asarray(values, dtype=np.int64) & 0xFF
+
+
+def filter_scenario(config_values, input_values, s):
+    """
+    Return the expected output bytes of a scenario: config_values holds C1-C14 and input_values the
+    scenario, both as memory bytes. Inputs outside the scenario count as zero, negative sums get 1 added
+    to every shifted term of the normalisation, and the result saturates to -128..127.
+    """
+    coefficients = to_signed(config_values)[FILTER_LENGTH * s:FILTER_LENGTH * (s + 1)]
+    samples = to_signed(input_values)
+    length = len(samples)
+
+    padded = np.concatenate([np.zeros(FILTER_RADIUS, dtype=np.int64), samples, np.zeros(FILTER_RADIUS, dtype=np.int64)])
+    accumulator = np.zeros(length, dtype=np.int64)
+    for k in range(FILTER_LENGTH):
+        accumulator += coefficients[k] * padded[k:k + length]
+
+    negative = (accumulator < 0).astype(np.int64)
+    normalized = np.zeros(length, dtype=np.int64)
+    for shift in NORMALIZATION_SHIFTS[s]:
+        normalized += (accumulator >> shift) + negative
+
+    return to_unsigned(np.clip(normalized, -128, 127))
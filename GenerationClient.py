@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+# This script asks a running GenerationServer for testbenches; it imports neither pandas nor the generators, so it starts fast
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Filter order of the ReadFromExcelAndProduceTB<order> scripts -> S
+ORDERS = {3: 0, 5: 1}
+
+
+def connect(address):
+    """Connect to the server at a (host, port) pair or at the path of a Unix socket."""
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    connection.connect(address)
+    return connection
+
+
+def send_request(message, address=(DEFAULT_HOST, DEFAULT_PORT)):
+    """Send one request (a dictionary) to the server and return its response."""
+    with connect(address) as connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(message).encode('utf-8') + b"\n")
+        stream.flush()
+        response = stream.readline()
+    if not response:
+        raise ConnectionError("The generation server closed the connection without answering")
+    return json.loads(response)
+
+
+def generate_testbench(excel_file, s, output_file=None, return_bytes=False, address=(DEFAULT_HOST, DEFAULT_PORT), **options):
+    """
+    Ask the server for the testbench of the workbook for S. Paths are sent as absolute paths, the server
+    may run in another directory. The options are the ones of process_excel_to_testbench (layout_file,
+    package_file, package_name, instrument_report, history_file) plus clock_period and scenario_address.
+    Return the server response: the testbench text under "testbench" with return_bytes, else its "output_file".
+    """
+    message = {"command": "generate", "workbook": os.path.abspath(excel_file), "s": s,
+               "return": "bytes" if return_bytes else "path"}
+    if output_file is not None:
+        message["output_file"] = os.path.abspath(output_file)
+    for name, value in options.items():
+        if value is not None:
+            message[name] = os.path.abspath(value) if name.endswith("_file") or name == "instrument_report" else value
+    return send_request(message, address)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a testbench through a running generation server")
+    parser.add_argument("excel_file", nargs="?", help="workbook holding the scenario")
+    parser.add_argument("--order", type=int, choices=sorted(ORDERS), default=3, help="filter order of the testbench")
+    parser.add_argument("-o", "--output", default=None, help="testbench file (default: timestamped, next to the workbook)")
+    parser.add_argument("--stdout", action="store_true", help="write the testbench to the standard output instead of a file")
+    parser.add_argument("--layout", default=None, help="layout file of the workbook")
+    parser.add_argument("--package-file", default=None, help="shared VHDL data package to write")
+    parser.add_argument("--package-name", default=None, help="name of the package (default: derived from its file name)")
+    parser.add_argument("--instrument-report", default=None, help="report file of the DUT performance counters")
+    parser.add_argument("--history", default=None, help="performance history (SQLite file) of the generation")
+    parser.add_argument("--clock-period", default=None, help="clock period of the testbench, e.g. \"20 ns\"")
+    parser.add_argument("--scenario-address", type=int, default=None, help="memory address of the scenario")
+    parser.add_argument("--stats", action="store_true", help="print the workbook cache statistics of the server")
+    parser.add_argument("--shutdown", action="store_true", help="stop the server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address of the server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port of the server")
+    parser.add_argument("--socket", default=None, help="Unix socket of the server, instead of host and port")
+    args = parser.parse_args(argv)
+
+    address = args.socket if args.socket is not None else (args.host, args.port)
+    try:
+        if args.stats or args.shutdown:
+            response = send_request({"command": "stats" if args.stats else "shutdown"}, address)
+            print(json.dumps(response, indent=2))
+            return 0 if response["status"] == "ok" else 1
+        if args.excel_file is None:
+            parser.error("the workbook is required")
+
+        response = generate_testbench(args.excel_file, ORDERS[args.order], args.output, args.stdout, address,
+                                      layout_file=args.layout, package_file=args.package_file,
+                                      package_name=args.package_name, instrument_report=args.instrument_report,
+                                      history_file=args.history,
+                                      clock_period=args.clock_period, scenario_address=args.scenario_address)
+    except (OSError, ValueError) as e:
+        print(f"Could not reach the generation server at {address}: {str(e)}", file=sys.stderr)
+        return 1
+
+    if response["status"] != "ok":
+        print(response["message"], file=sys.stderr)
+        for error in response.get("errors", []):
+            print(f"  {error}", file=sys.stderr)
+        return 1
+    if args.stdout:
+        sys.stdout.write(response["testbench"])
+    else:
+        print(f"VHDL testbench file created successfully: {response['output_file']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
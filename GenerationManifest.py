@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from SimulationCache import file_digest
+
+# This script keeps an append-only manifest of the testbenches generated by a batch run, so an interrupted run can resume
+
+DEFAULT_MANIFEST_NAME = "manifest.jsonl"
+
+
+def work_item_key(content_hash, sheet_name, s, generator_version, layout):
+    """
+    Key of one work item: the content of its sheet (see WorkbookFingerprint.sheet_fingerprints, or the hash
+    of the whole workbook), the sheet, S, the version of the generator and the layout.
+    Changing any of them makes the item pending again.
+    """
+    description = json.dumps([content_hash, sheet_name, s, generator_version, layout], sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def load_manifest(manifest_file):
+    """
+    Return {item key: entry} for the items recorded in the manifest, the last entry of an item winning.
+    A line cut short by an interrupted run is ignored.
+    """
+    entries = {}
+    if not os.path.exists(manifest_file):
+        return entries
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["item"]] = entry
+    return entries
+
+
+def output_path(manifest_file, entry):
+    """Return the path of the output of an entry, stored relative to the manifest directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(manifest_file)), entry["output_file"])
+
+
+def is_verified(manifest_file, entry):
+    """
+    Return True if the output of the entry is on disk with the recorded size and SHA-256,
+    or if the item completed without output (e.g. a sheet without scenario).
+    """
+    if entry["output_file"] is None:
+        return True
+    path = output_path(manifest_file, entry)
+    try:
+        return os.path.getsize(path) == entry["size"] and file_digest(path) == entry["sha256"]
+    except OSError:
+        return False
+
+
+def append_entry(manifest_file, item_key, output_file, **details):
+    """
+    Append the completed work item and the hash of its output to the manifest; output_file is None for an item
+    that completed without output. The line is flushed to disk before returning, so an item is only recorded
+    once its output is complete.
+    """
+    entry = {"item": item_key, "output_file": None, "completed_at": time.time()}
+    if output_file is not None:
+        entry.update(output_file=os.path.relpath(output_file, os.path.dirname(os.path.abspath(manifest_file))),
+                     size=os.path.getsize(output_file), sha256=file_digest(output_file))
+    entry.update(details)
+
+    with open(manifest_file, 'a+b') as f:
+        # Terminate a line left unfinished by an interrupted run, so the new entry stays readable
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write(json.dumps(entry).encode('utf-8') + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return entry
+
+
+def check_manifest(manifest_file, output_pattern=r".*_testbench\.vhd"):
+    """
+    Check the manifest against the files on disk: every recorded output must exist with its recorded hash,
+    and every file of the manifest directory matching output_pattern should be recorded.
+    Print the problems found and return them as a list of messages.
+    """
+    entries = load_manifest(manifest_file)
+    problems = []
+    recorded = set()
+    for entry in entries.values():
+        if entry["output_file"] is None:
+            continue
+        path = output_path(manifest_file, entry)
+        recorded.add(os.path.normpath(path))
+        if not os.path.exists(path):
+            problems.append(f"missing output {entry['output_file']}")
+        elif not is_verified(manifest_file, entry):
+            problems.append(f"output {entry['output_file']} does not match its recorded hash")
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    for name in sorted(os.listdir(manifest_dir)):
+        path = os.path.normpath(os.path.join(manifest_dir, name))
+        if re.fullmatch(output_pattern, name) and path not in recorded:
+            problems.append(f"output {name} is not recorded in the manifest")
+
+    for problem in problems:
+        print(f"  {problem}")
+    print(f"Manifest {manifest_file}: {len(entries)} item(s), {len(problems)} problem(s)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a generation manifest against the files on disk")
+    parser.add_argument("manifest", help="manifest file written by a batch generation")
+    parser.add_argument("--outputs", default=r".*_testbench\.vhd", help="regular expression of the output file names")
+    args = parser.parse_args(argv)
+    return 1 if check_manifest(args.manifest, args.outputs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
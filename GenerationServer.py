@@ -0,0 +1,230 @@
+import argparse
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+import ReadFromExcelAndProduceTB3
+from GenerationClient import DEFAULT_HOST, DEFAULT_PORT
+from PerformanceHistory import record_generation, workbook_digest
+from ScenarioLayout import DEFAULT_LAYOUT, EXPECTED_ROLES, load_layout, read_layout_data
+from SharedScenarioPackage import generate_vhdl_package, package_name_for, package_references
+from TestbenchGenerators import GENERATORS
+from ValidateScenarioData import validate_layout_data
+from WorkbookFingerprint import workbook_fingerprint
+
+# This script serves testbench generations from a long-lived process that keeps the parsed workbooks in memory
+
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+# Serializes the writes of shared data packages, two requests may name the same package file
+package_lock = threading.Lock()
+
+
+class WorkbookCache:
+    """
+    Parsed and formatted data of the workbooks, kept in least recently used order within a memory budget.
+    An entry is reused as long as the fingerprint of the sheets it was read from is unchanged
+    (see WorkbookFingerprint), or the modification time and size for workbooks that are not xlsx archives.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # One lock per workbook, so concurrent requests for a workbook being parsed wait for that parse
+        self.loading = {}
+
+    def get(self, excel_file, layout_file=DEFAULT_LAYOUT):
+        """Return the cache entry of the workbook, parsing it if needed, and whether it was already cached."""
+        layout = load_layout(layout_file)
+        roles = ["config", "input"] + [role for role in EXPECTED_ROLES.values() if role in layout["roles"]]
+        key = (os.path.abspath(excel_file), json.dumps(layout, sort_keys=True))
+        with self.lock:
+            key_lock = self.loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            version = workbook_fingerprint(excel_file, sorted({layout["roles"][role]["sheet"] for role in roles}))
+            if version is None:
+                stat = os.stat(excel_file)
+                version = (stat.st_mtime_ns, stat.st_size)
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and entry["version"] == version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry, True
+
+            data = read_layout_data(excel_file, layout, roles)
+            format_values = ReadFromExcelAndProduceTB3.format_column_values
+            entry = {"workbook": key[0], "workbook_hash": workbook_digest(excel_file), "layout": layout,
+                     "version": version, "data": data,
+                     "formatted": {role: format_values(data[role]) for role in roles},
+                     "scenario_length": len(data["input"]), "errors": {}}
+            entry["size"] = (sum(int(values.memory_usage(deep=True)) for values in data.values())
+                             + sum(len(text) for text in entry["formatted"].values()))
+
+            with self.lock:
+                previous = self.entries.pop(key, None)
+                if previous is not None:
+                    self.memory_used -= previous["size"]
+                self.entries[key] = entry
+                self.memory_used += entry["size"]
+                self.misses += 1
+                # Evict the least recently used workbooks, always keeping the one just parsed
+                while self.memory_used > self.memory_budget and len(self.entries) > 1:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.memory_used -= evicted["size"]
+            return entry, False
+
+    def stats(self):
+        """Return the cache statistics."""
+        with self.lock:
+            return {"memory_budget": self.memory_budget, "memory_used": self.memory_used, "hits": self.hits,
+                    "misses": self.misses, "workbooks": [{"workbook": entry["workbook"], "size": entry["size"]}
+                                                         for entry in self.entries.values()]}
+
+
+def validation_errors(entry, s, scenario_address):
+    """Validate the data of a cached workbook for S and a scenario address, once per combination."""
+    if (s, scenario_address) not in entry["errors"]:
+        entry["errors"][s, scenario_address] = validate_layout_data(entry["layout"], entry["data"], s, scenario_address)
+    return entry["errors"][s, scenario_address]
+
+
+def generate(cache, request):
+    """
+    Serve a "generate" request: the workbook, S and the options of process_excel_to_testbench. The testbench
+    is written to request["output_file"] (by default a timestamped file next to the workbook) or, when
+    request["return"] is "bytes", returned in the response.
+    """
+    s = int(request["s"])
+    if s not in GENERATORS:
+        raise ValueError(f"S must be one of {sorted(GENERATORS)}")
+    generate_vhdl_testbench, suffix = GENERATORS[s]
+    excel_file = request["workbook"]
+    scenario_address = 1234 if request.get("scenario_address") is None else int(request["scenario_address"])
+
+    start = time.perf_counter()
+    entry, cached = cache.get(excel_file, request.get("layout_file") or DEFAULT_LAYOUT)
+    role = EXPECTED_ROLES[s]
+    if role not in entry["formatted"]:
+        raise ValueError(f"The layout has no '{role}' role")
+    errors = validation_errors(entry, s, scenario_address)
+    if errors:
+        return {"status": "error", "message": "Invalid data found in the Excel file:", "errors": errors}
+
+    formatted = entry["formatted"]
+    config_header_data, input_data = formatted["config"], formatted["input"]
+    if request.get("package_file") is not None:
+        package_name = request.get("package_name") or package_name_for(request["package_file"])
+        with package_lock:
+            generate_vhdl_package(config_header_data, input_data, entry["scenario_length"], request["package_file"],
+                                  package_name)
+        config_header_data, input_data = package_references(package_name)
+
+    if request.get("return") == "bytes":
+        output_file = io.StringIO()
+    else:
+        # The order is part of the default name, the two testbenches of a workbook may be requested in the same second
+        output_file = request.get("output_file") or (f"{os.path.splitext(excel_file)[0]}_"
+                                                     f"{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}_{suffix}_testbench.vhd")
+    generate_vhdl_testbench(config_header_data, input_data, formatted[role], output_file, entry["scenario_length"],
+                            request.get("instrument_report"), request.get("clock_period") or "20 ns", scenario_address,
+                            os.path.basename(excel_file), entry["workbook_hash"])
+    generation_time = time.perf_counter() - start
+    if request.get("history_file") is not None:
+        # Keyed by the hash written in the testbench header, taken when the workbook was parsed
+        record_generation(request["history_file"], excel_file, output_file, s, generation_time, generate_vhdl_testbench,
+                          workbook_hash=entry["workbook_hash"])
+
+    response = {"status": "ok", "cached": cached, "generation_time": generation_time}
+    if isinstance(output_file, io.StringIO):
+        response["testbench"] = output_file.getvalue()
+    else:
+        response["output_file"] = output_file
+    return response
+
+
+class GenerationRequestHandler(socketserver.StreamRequestHandler):
+    """Answer each JSON request line of a connection with one JSON response line."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                command = request.get("command", "generate")
+                if command == "generate":
+                    response = generate(self.server.cache, request)
+                elif command == "stats":
+                    response = {"status": "ok", **self.server.cache.stats()}
+                elif command == "shutdown":
+                    # shutdown() waits for serve_forever() to return, it cannot run on the serving thread
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    response = {"status": "ok"}
+                else:
+                    response = {"status": "error", "message": f"Unknown command '{command}'"}
+            except Exception as e:
+                response = {"status": "error", "message": f"An unexpected error occurred: {str(e)}"}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+
+class GenerationServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixGenerationServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+def serve(address=(DEFAULT_HOST, DEFAULT_PORT), memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Serve the requests on a (host, port) pair or on the path of a Unix socket until a shutdown request."""
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.remove(address)
+        server = UnixGenerationServer(address, GenerationRequestHandler)
+    else:
+        server = GenerationServer(address, GenerationRequestHandler)
+    server.cache = WorkbookCache(memory_budget)
+
+    print(f"Generation server listening on {address}, workbook cache of {memory_budget / 1024 / 1024:g} MiB")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)
+    print("Generation server stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve testbench generations, keeping the parsed workbooks in memory")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--socket", default=None, help="listen on this Unix socket instead of host and port")
+    parser.add_argument("--memory-budget", type=float, default=DEFAULT_MEMORY_BUDGET / 1024 / 1024,
+                        help="memory budget of the workbook cache in MiB")
+    args = parser.parse_args(argv)
+
+    serve(args.socket if args.socket is not None else (args.host, args.port), int(args.memory_budget * 1024 * 1024))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import inspect
+import math
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import time
+
+from SimulationCache import file_digest
+from WorkbookSource import is_path
+
+# This script keeps a local SQLite history of generation and simulation metrics and flags regressions against a baseline
+
+DEFAULT_HISTORY_FILE = "performance_history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorded_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    workbook_hash TEXT,
+    template_version TEXT,
+    s INTEGER,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (kind, scenario, s);
+"""
+
+# Provenance of a generated testbench, written in its header comment: key -> label
+PROVENANCE_FIELDS = {"workbook": "Workbook", "workbook_hash": "Workbook SHA-256", "template_version": "Template version"}
+
+
+def connect(history_file=DEFAULT_HISTORY_FILE):
+    """Open the history database, creating its tables if needed."""
+    connection = sqlite3.connect(history_file, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def workbook_digest(source):
+    """Return the SHA-256 hex digest of a workbook given as a path, a buffer or a binary stream."""
+    if is_path(source):
+        return file_digest(source)
+    if hasattr(source, "read"):
+        digest = hashlib.sha256()
+        source.seek(0)
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+        source.seek(0)
+        return digest.hexdigest()
+    return hashlib.sha256(memoryview(source)).hexdigest()
+
+
+def source_version(function):
+    """Return a short hash of a function source code, used as the version of the template it holds."""
+    return hashlib.sha256(inspect.getsource(function).encode()).hexdigest()[:12]
+
+
+def provenance_header(**provenance):
+    """Return the header comment lines recording the provenance of a testbench (see PROVENANCE_FIELDS)."""
+    return "".join(f"-- {label}: {provenance[key]}\n" for key, label in PROVENANCE_FIELDS.items()
+                   if provenance.get(key) is not None)
+
+
+def read_provenance(testbench_file):
+    """Return the provenance recorded in the header comment of a generated testbench."""
+    with open(testbench_file, 'r', encoding='utf-8') as f:
+        header = f.read(4096)
+    provenance = {}
+    for key, label in PROVENANCE_FIELDS.items():
+        match = re.search(rf"^-- {label}: (.+)$", header, re.MULTILINE)
+        if match:
+            provenance[key] = match.group(1).strip()
+    return provenance
+
+
+def record_run(history_file, kind, scenario, metrics, workbook_hash=None, template_version=None, s=None, label=None):
+    """Append one run and its metrics (a dictionary name -> number) to the history. Return the run id."""
+    connection = connect(history_file)
+    try:
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (recorded_at, kind, scenario, workbook_hash, template_version, s, label) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), kind, scenario, workbook_hash, template_version, s, label))
+            connection.executemany("INSERT INTO metrics (run_id, name, value) VALUES (?, ?, ?)",
+                                   [(cursor.lastrowid, name, float(value)) for name, value in metrics.items()])
+        return cursor.lastrowid
+    finally:
+        connection.close()
+
+
+def record_generation(history_file, excel_file, output_file, s, generation_time, generator, label=None,
+                      workbook_hash=None):
+    """
+    Record the generation time and testbench size of a generated testbench. Pass the workbook_hash written
+    in the testbench header, if already computed, so the run is keyed by that same hash.
+    """
+    if hasattr(output_file, "getvalue"):
+        file_size = len(output_file.getvalue().encode('utf-8'))
+    else:
+        file_size = os.path.getsize(output_file)
+    scenario = os.path.basename(excel_file) if is_path(excel_file) else "workbook"
+    return record_run(history_file, "generation", scenario, {"generation_time": generation_time, "file_size": file_size},
+                      workbook_hash or workbook_digest(excel_file), source_version(generator), s, label)
+
+
+def record_simulation(history_file, result, label=None):
+    """
+    Record the simulation time of a testbench run by RunSimulations, skipping cached and failed runs.
+    The run is keyed by the workbook, workbook hash and template version read from the testbench header,
+    like its generation, rather than by the (timestamped) testbench file name.
+    """
+    if result["status"] != "passed" or result.get("cached"):
+        return None
+    with open(result["testbench"], 'r', encoding='utf-8') as f:
+        match = re.search(r"^\s*(\d+),\s*-- S\s*$", f.read(), re.MULTILINE)
+    s = int(match.group(1)) if match else None
+    provenance = read_provenance(result["testbench"])
+    return record_run(history_file, "simulation", provenance.get("workbook", os.path.basename(result["testbench"])),
+                      {"simulation_time": result["runtime"]}, provenance.get("workbook_hash"),
+                      provenance.get("template_version"), s, label)
+
+
+def regularized_incomplete_beta(x, a, b):
+    """Regularized incomplete beta function I_x(a, b), evaluated with its continued fraction."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - regularized_incomplete_beta(1 - x, b, a)
+
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 200):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return front * fraction
+
+
+def welch_slowdown_p_value(baseline, candidate):
+    """
+    One-sided Welch t-test p-value for "the candidate values are greater than the baseline values".
+    Return None when either side has fewer than two values.
+    """
+    if len(baseline) < 2 or len(candidate) < 2:
+        return None
+    mean_difference = statistics.mean(candidate) - statistics.mean(baseline)
+    var_b = statistics.variance(baseline) / len(baseline)
+    var_c = statistics.variance(candidate) / len(candidate)
+    if var_b + var_c == 0:
+        return 0.0 if mean_difference > 0 else 1.0
+
+    t = mean_difference / math.sqrt(var_b + var_c)
+    df = (var_b + var_c) ** 2 / (var_b ** 2 / (len(baseline) - 1) + var_c ** 2 / (len(candidate) - 1))
+    tail = 0.5 * regularized_incomplete_beta(df / (df + t * t), df / 2, 0.5)
+    return tail if t > 0 else 1.0 - tail
+
+
+def select_values(connection, selector, after_run=0):
+    """
+    Return {(kind, scenario, workbook_hash, s, metric): [values]} for the runs whose label or template version equals
+    the selector, or for every run recorded after after_run when the selector is None.
+    """
+    query = ("SELECT runs.kind, runs.scenario, runs.workbook_hash, runs.s, metrics.name, metrics.value "
+             "FROM runs JOIN metrics ON metrics.run_id = runs.id WHERE runs.id > ?")
+    parameters = [after_run]
+    if selector is not None:
+        query += " AND (runs.label = ? OR runs.template_version = ?)"
+        parameters += [selector, selector]
+
+    values = {}
+    for kind, scenario, workbook_hash, s, name, value in connection.execute(query + " ORDER BY runs.id", parameters):
+        values.setdefault((kind, scenario, workbook_hash, s, name), []).append(value)
+    return values
+
+
+def compare_runs(history_file, baseline, candidate=None, alpha=0.05, min_change=0.05):
+    """
+    Compare every metric of the candidate runs with the baseline runs (selected by label or template version;
+    by default the candidate is every run recorded after the last baseline run) and print the changes.
+    A metric is flagged as a regression when its mean grows by at least min_change and the one-sided
+    Welch t-test is significant at level alpha. Return the list of regressions.
+    """
+    connection = connect(history_file)
+    try:
+        last_baseline = connection.execute("SELECT MAX(id) FROM runs WHERE label = ? OR template_version = ?",
+                                           (baseline, baseline)).fetchone()[0]
+        if last_baseline is None:
+            print(f"No run matches the baseline '{baseline}'")
+            return []
+        baseline_values = select_values(connection, baseline)
+        candidate_values = select_values(connection, candidate, 0 if candidate is not None else last_baseline)
+    finally:
+        connection.close()
+
+    regressions = []
+    print(f"{'Kind':<10}  {'Scenario':<40}  {'S':>1}  {'Metric':<16}  {'Baseline':>12}  {'Candidate':>12}  "
+          f"{'Change':>8}  {'p':>7}")
+    for key in sorted(set(baseline_values) & set(candidate_values), key=str):
+        kind, scenario, workbook_hash, s, name = key
+        if workbook_hash is not None:
+            scenario = f"{scenario} ({workbook_hash[:8]})"
+        base, cand = baseline_values[key], candidate_values[key]
+        base_mean, cand_mean = statistics.mean(base), statistics.mean(cand)
+        change = (cand_mean - base_mean) / base_mean if base_mean else 0.0
+        p_value = welch_slowdown_p_value(base, cand)
+
+        flag = ""
+        if p_value is not None and p_value < alpha and change >= min_change:
+            flag = "  REGRESSION"
+            regressions.append({"kind": kind, "scenario": scenario, "workbook_hash": workbook_hash, "s": s, "metric": name, "baseline": base_mean,
+                                "candidate": cand_mean, "change": change, "p_value": p_value})
+        p_text = "n/a" if p_value is None else f"{p_value:.4f}"
+        print(f"{kind:<10}  {scenario[-40:]:<40}  {'' if s is None else s:>1}  {name:<16}  {base_mean:>12.4g}  "
+              f"{cand_mean:>12.4g}  {change:>+8.1%}  {p_text:>7}{flag}")
+
+    print(f"\n{len(regressions)} significant regression(s) against baseline '{baseline}'")
+    return regressions
+
+
+def list_runs(history_file, limit=20):
+    """Print the most recent runs of the history."""
+    connection = connect(history_file)
+    try:
+        rows = connection.execute(
+            "SELECT runs.id, runs.recorded_at, runs.kind, runs.scenario, runs.s, runs.template_version, runs.label, "
+            "GROUP_CONCAT(metrics.name || '=' || metrics.value, ', ') FROM runs JOIN metrics ON metrics.run_id = runs.id "
+            "GROUP BY runs.id ORDER BY runs.id DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        connection.close()
+    for run_id, recorded_at, kind, scenario, s, version, label, metrics in reversed(rows):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(recorded_at))
+        print(f"{run_id:>6}  {when}  {kind:<10}  {scenario}  S={s}  template={version}  label={label}  {metrics}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the performance history and flag regressions")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_FILE, help="SQLite history file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare = commands.add_parser("compare", help="compare runs against a baseline")
+    compare.add_argument("--baseline", required=True, help="label or template version of the baseline runs")
+    compare.add_argument("--candidate", default=None, help="label or template version (default: runs after the baseline)")
+    compare.add_argument("--alpha", type=float, default=0.05, help="significance level of the t-test")
+    compare.add_argument("--min-change", type=float, default=0.05, help="smallest relative slowdown reported")
+
+    show = commands.add_parser("list", help="list the most recent runs")
+    show.add_argument("-n", "--limit", type=int, default=20, help="number of runs to list")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        list_runs(args.history, args.limit)
+        return 0
+    regressions = compare_runs(args.history, args.baseline, args.candidate, args.alpha, args.min_change)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
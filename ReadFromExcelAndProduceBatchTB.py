@@ -0,0 +1,382 @@
+import argparse
+import os
+import re
+import sys
+
+import pandas as pd
+
+from ReadFromExcelAndProduceTB3 import format_column_values
+from ScenarioLayout import DEFAULT_LAYOUT, EXPECTED_ROLES, layout_for_sheet, load_layout, parse_layout_data
+from ValidateScenarioData import HEADER_LENGTH, MEMORY_SIZE, print_validation_errors, validate_layout_data
+from WorkbookSource import is_path, open_workbook_source
+
+# This script packs many scenarios into one VHDL testbench that runs them back to back, with a reset between runs
+
+def vhdl_aggregate(values):
+    """Return a VHDL array aggregate; a single element needs named association to be an aggregate."""
+    formatted = values if isinstance(values, str) else format_column_values(values)
+    if "," not in formatted:
+        return f"( 0 => {formatted} )"
+    return f"( {formatted} )"
+
+
+def generate_batch_testbench(scenarios, output_file, clock_period="20 ns", scenario_address=1234):
+    """
+    Generate a VHDL testbench running every scenario of the list back to back. Each scenario is a dictionary
+    with its "name", "s", "config" (C1-C14), "input" and "expected" values. The RAM is cleared and the
+    component reset before each run, and a failure reports the index of the scenario it belongs to.
+    """
+
+    tb_template = """-- TB BATCH PFRL 2024-2025
+--
+-- Scenarios:
+{scenario_list}
+
+library ieee;
+use ieee.std_logic_1164.all;
+use ieee.numeric_std.all;
+use std.textio.all;
+
+entity tb2425 is
+end tb2425;
+
+architecture project_tb_arch of tb2425 is
+
+    constant CLOCK_PERIOD : time := {clock_period};
+
+    -- Signals to be connected to the component
+    signal tb_clk : std_logic := '0';
+    signal tb_rst, tb_start, tb_done : std_logic;
+    signal tb_add : std_logic_vector(15 downto 0);
+
+    -- Signals for the memory
+    signal tb_o_mem_addr, exc_o_mem_addr, init_o_mem_addr : std_logic_vector(15 downto 0);
+    signal tb_o_mem_data, exc_o_mem_data, init_o_mem_data : std_logic_vector(7 downto 0);
+    signal tb_i_mem_data : std_logic_vector(7 downto 0);
+    signal tb_o_mem_we, tb_o_mem_en, exc_o_mem_we, exc_o_mem_en, init_o_mem_we, init_o_mem_en : std_logic;
+
+    -- Memory
+    type ram_type is array (65535 downto 0) of std_logic_vector(7 downto 0);
+    signal RAM : ram_type := (OTHERS => "00000000");
+    signal ram_clear : std_logic := '0';           -- Clears the memory between two scenarios
+
+    -- Scenarios, stored one after the other in the data arrays
+    type integer_array is array (natural range <>) of integer;
+    constant SCENARIO_COUNT : integer := {scenario_count};
+    constant SCENARIO_LENGTHS : integer_array(0 to SCENARIO_COUNT-1) := {scenario_lengths};
+    constant SCENARIO_OFFSETS : integer_array(0 to SCENARIO_COUNT-1) := {scenario_offsets};
+    constant SCENARIO_S : integer_array(0 to SCENARIO_COUNT-1) := {scenario_s};
+    constant SCENARIO_CONFIGS : integer_array(0 to 14*SCENARIO_COUNT-1) := {scenario_configs};     -- C1-C14 of each scenario
+    constant SCENARIO_INPUTS : integer_array(0 to {total_length}-1) := {scenario_inputs};
+    constant SCENARIO_OUTPUTS : integer_array(0 to {total_length}-1) := {scenario_outputs};
+
+    signal memory_control : std_logic := '0';      -- A signal to decide when the memory is accessed
+                                                   -- by the testbench or by the project
+
+    constant SCENARIO_ADDRESS : integer := {scenario_address};    -- This value may arbitrarily change
+
+    component project_reti_logiche is
+        port (
+                i_clk : in std_logic;
+                i_rst : in std_logic;
+                i_start : in std_logic;
+                i_add : in std_logic_vector(15 downto 0);
+
+                o_done : out std_logic;
+
+                o_mem_addr : out std_logic_vector(15 downto 0);
+                i_mem_data : in  std_logic_vector(7 downto 0);
+                o_mem_data : out std_logic_vector(7 downto 0);
+                o_mem_we   : out std_logic;
+                o_mem_en   : out std_logic
+        );
+    end component project_reti_logiche;
+
+begin
+    UUT : project_reti_logiche
+    port map(
+                i_clk   => tb_clk,
+                i_rst   => tb_rst,
+                i_start => tb_start,
+                i_add   => tb_add,
+
+                o_done => tb_done,
+
+                o_mem_addr => exc_o_mem_addr,
+                i_mem_data => tb_i_mem_data,
+                o_mem_data => exc_o_mem_data,
+                o_mem_we   => exc_o_mem_we,
+                o_mem_en   => exc_o_mem_en
+    );
+
+    -- Clock generation
+    tb_clk <= not tb_clk after CLOCK_PERIOD/2;
+
+    -- Process related to the memory
+    MEM : process (tb_clk)
+    begin
+        if tb_clk'event and tb_clk = '1' then
+            if ram_clear = '1' then
+                RAM <= (OTHERS => "00000000");
+            elsif tb_o_mem_en = '1' then
+                if tb_o_mem_we = '1' then
+                    RAM(to_integer(unsigned(tb_o_mem_addr))) <= tb_o_mem_data after 1 ns;
+                    tb_i_mem_data <= tb_o_mem_data after 1 ns;
+                else
+                    tb_i_mem_data <= RAM(to_integer(unsigned(tb_o_mem_addr))) after 1 ns;
+                end if;
+            end if;
+        end if;
+    end process;
+
+    memory_signal_swapper : process(memory_control, init_o_mem_addr, init_o_mem_data,
+                                    init_o_mem_en,  init_o_mem_we,   exc_o_mem_addr,
+                                    exc_o_mem_data, exc_o_mem_en, exc_o_mem_we)
+    begin
+        -- This is necessary for the testbench to work: we swap the memory
+        -- signals from the component to the testbench when needed.
+
+        tb_o_mem_addr <= init_o_mem_addr;
+        tb_o_mem_data <= init_o_mem_data;
+        tb_o_mem_en   <= init_o_mem_en;
+        tb_o_mem_we   <= init_o_mem_we;
+
+        if memory_control = '1' then
+            tb_o_mem_addr <= exc_o_mem_addr;
+            tb_o_mem_data <= exc_o_mem_data;
+            tb_o_mem_en   <= exc_o_mem_en;
+            tb_o_mem_we   <= exc_o_mem_we;
+        end if;
+    end process;
+
+    -- This process provides the scenarios, one after the other, on the signals controlled by the TB
+    create_scenario : process
+        variable length_stl : std_logic_vector(15 downto 0);
+        variable header : integer;
+    begin
+        wait for 50 ns;
+
+        for sc in 0 to SCENARIO_COUNT-1 loop
+            -- Signal initialization, reset of the component and clear of the memory
+            memory_control <= '0';  -- Memory controlled by the testbench
+            init_o_mem_en  <= '0';
+            init_o_mem_we  <= '0';
+            tb_start <= '0';
+            tb_add <= (others=>'0');
+            tb_rst <= '1';
+            ram_clear <= '1';
+
+            -- Wait some time for the component to reset...
+            wait for 50 ns;
+
+            tb_rst <= '0';
+            ram_clear <= '0';
+
+            wait until falling_edge(tb_clk); -- Skew the testbench transitions with respect to the clock
+
+            length_stl := std_logic_vector(to_unsigned(SCENARIO_LENGTHS(sc), 16));
+            for i in 0 to 16 loop
+                if i = 0 then
+                    header := to_integer(unsigned(length_stl(15 downto 8)));    -- K1
+                elsif i = 1 then
+                    header := to_integer(unsigned(length_stl(7 downto 0)));     -- K2
+                elsif i = 2 then
+                    header := SCENARIO_S(sc);                                   -- S
+                else
+                    header := SCENARIO_CONFIGS(14*sc+i-3);                      -- C1-C14
+                end if;
+                init_o_mem_addr<= std_logic_vector(to_unsigned(SCENARIO_ADDRESS+i, 16));
+                init_o_mem_data<= std_logic_vector(to_unsigned(header,8));
+                init_o_mem_en  <= '1';
+                init_o_mem_we  <= '1';
+                wait until rising_edge(tb_clk);
+            end loop;
+
+            for i in 0 to SCENARIO_LENGTHS(sc)-1 loop
+                init_o_mem_addr<= std_logic_vector(to_unsigned(SCENARIO_ADDRESS+17+i, 16));
+                init_o_mem_data<= std_logic_vector(to_unsigned(SCENARIO_INPUTS(SCENARIO_OFFSETS(sc)+i),8));
+                init_o_mem_en  <= '1';
+                init_o_mem_we  <= '1';
+                wait until rising_edge(tb_clk);
+            end loop;
+
+            wait until falling_edge(tb_clk);
+
+            init_o_mem_en  <= '0';
+            init_o_mem_we  <= '0';
+            memory_control <= '1';  -- Memory controlled by the component
+
+            tb_add <= std_logic_vector(to_unsigned(SCENARIO_ADDRESS, 16));
+
+            tb_start <= '1';
+
+            while tb_done /= '1' loop
+                wait until rising_edge(tb_clk);
+            end loop;
+
+            wait for 5 ns;
+
+            tb_start <= '0';
+
+            wait until tb_done = '0';
+        end loop;
+
+        wait;
+
+    end process;
+
+    -- Process without sensitivity list designed to test the actual component, once per scenario.
+    test_routine : process
+    begin
+
+        for sc in 0 to SCENARIO_COUNT-1 loop
+            wait until tb_rst = '1';
+            wait for 25 ns;
+            assert tb_done = '0' report "TEST FALLITO (SCENARIO " & integer'image(sc) & ") o_done !=0 during reset" severity failure;
+            wait until tb_rst = '0';
+
+            wait until falling_edge(tb_clk);
+            assert tb_done = '0' report "TEST FALLITO (SCENARIO " & integer'image(sc) & ") o_done !=0 after reset before start" severity failure;
+
+            wait until rising_edge(tb_start);
+
+            while tb_done /= '1' loop
+                wait until rising_edge(tb_clk);
+            end loop;
+
+            assert tb_o_mem_en = '0' or tb_o_mem_we = '0' report "TEST FALLITO (SCENARIO " & integer'image(sc) & ") o_mem_en !=0 memory should not be written after done." severity failure;
+
+            for i in 0 to SCENARIO_LENGTHS(sc)-1 loop
+                assert RAM(SCENARIO_ADDRESS+17+SCENARIO_LENGTHS(sc)+i) = std_logic_vector(to_unsigned(SCENARIO_OUTPUTS(SCENARIO_OFFSETS(sc)+i),8)) report "TEST FALLITO (SCENARIO " & integer'image(sc) & ") @ OFFSET=" & integer'image(17+SCENARIO_LENGTHS(sc)+i) & " expected= " & integer'image(SCENARIO_OUTPUTS(SCENARIO_OFFSETS(sc)+i)) & " actual=" & integer'image(to_integer(unsigned(RAM(SCENARIO_ADDRESS+17+SCENARIO_LENGTHS(sc)+i)))) severity failure;
+            end loop;
+
+            wait until falling_edge(tb_start);
+            assert tb_done = '1' report "TEST FALLITO (SCENARIO " & integer'image(sc) & ") o_done == 0 before start goes to zero" severity failure;
+            wait until falling_edge(tb_done);
+
+            report "Scenario " & integer'image(sc) & " passed" severity note;
+        end loop;
+
+        assert false report "Simulation Ended! TEST PASSATO (BATCH OF {scenario_count} SCENARIOS)" severity failure;
+    end process;
+
+end architecture;
+"""
+    lengths = [len(scenario["input"]) for scenario in scenarios]
+    offsets = [sum(lengths[:i]) for i in range(len(lengths))]
+
+    # Format the template with the data
+    vhdl_content = tb_template.format(
+        scenario_list="\n".join(f"--   {i}: {scenario['name']} (S={scenario['s']}, {length} values)"
+                                for i, (scenario, length) in enumerate(zip(scenarios, lengths))),
+        clock_period=clock_period,
+        scenario_address=scenario_address,
+        scenario_count=len(scenarios),
+        total_length=sum(lengths),
+        scenario_lengths=vhdl_aggregate(lengths),
+        scenario_offsets=vhdl_aggregate(offsets),
+        scenario_s=vhdl_aggregate([scenario["s"] for scenario in scenarios]),
+        scenario_configs=vhdl_aggregate(", ".join(format_column_values(scenario["config"]) for scenario in scenarios)),
+        scenario_inputs=vhdl_aggregate(", ".join(format_column_values(scenario["input"]) for scenario in scenarios)),
+        scenario_outputs=vhdl_aggregate(", ".join(format_column_values(scenario["expected"]) for scenario in scenarios))
+    )
+
+    # Write to stream or file
+    if hasattr(output_file, "write"):
+        output_file.write(vhdl_content)
+        print("VHDL batch testbench written to stream successfully")
+        return True
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(vhdl_content)
+
+    print(f"VHDL batch testbench file created successfully: {output_file} ({len(scenarios)} scenarios)")
+    return True
+
+
+def read_workbook_scenarios(excel_file, layout, orders=(0, 1), sheet_pattern=None):
+    """
+    Read and validate the scenarios of a workbook: one per order, on the layout sheet or on every sheet
+    matching sheet_pattern. Invalid scenarios are reported and left out.
+    """
+    scenarios = []
+    name = os.path.basename(excel_file) if is_path(excel_file) else "workbook"
+    with pd.ExcelFile(open_workbook_source(excel_file)) as workbook:
+        if sheet_pattern is None:
+            sheet_layouts = [(None, layout)]
+        else:
+            sheet_layouts = [(sheet, layout_for_sheet(layout, sheet)) for sheet in workbook.sheet_names
+                             if re.fullmatch(sheet_pattern, sheet)]
+
+        for sheet, sheet_layout in sheet_layouts:
+            roles = ["config", "input"] + [EXPECTED_ROLES[s] for s in orders]
+            data = parse_layout_data(workbook, sheet_layout, roles)
+            for s in orders:
+                role = EXPECTED_ROLES[s]
+                scenario_name = f"{name}:{sheet}" if sheet is not None else name
+                # The fit in memory depends on the batch address, it is checked when the batches are built
+                errors = validate_layout_data(sheet_layout, data, s, scenario_address=0)
+                if errors:
+                    print_validation_errors(errors, f"Skipping {scenario_name} S={s}, invalid data found in the Excel file:")
+                    continue
+                scenarios.append({"name": scenario_name, "s": s, "config": data["config"],
+                                  "input": data["input"], "expected": data[role]})
+    return scenarios
+
+
+def process_excel_to_batch_testbenches(excel_files, output_file, layout_file=DEFAULT_LAYOUT, orders=(0, 1),
+                                       sheet_pattern=None, batch_size=None, clock_period="20 ns", scenario_address=1234):
+    """
+    Collect the scenarios of all the workbooks and pack them into batch testbenches of at most batch_size
+    scenarios (all of them in one testbench by default). Return the list of generated testbench files.
+    """
+    layout = load_layout(layout_file)
+    scenarios = []
+    for excel_file in excel_files:
+        try:
+            scenarios.extend(read_workbook_scenarios(excel_file, layout, orders, sheet_pattern))
+        except Exception as e:
+            print(f"Failed to read {excel_file}: {str(e)}")
+
+    # Like invalid scenarios, the ones that do not fit in memory at this address are left out
+    fitting = []
+    for scenario in scenarios:
+        if scenario_address + HEADER_LENGTH + 2 * len(scenario["input"]) > MEMORY_SIZE:
+            print(f"Skipping {scenario['name']} S={scenario['s']}, a scenario of {len(scenario['input'])} values "
+                  f"does not fit in memory at address {scenario_address}")
+        else:
+            fitting.append(scenario)
+    scenarios = fitting
+    if not scenarios:
+        print("No valid scenario found.")
+        return []
+
+    batch_size = batch_size or len(scenarios)
+    batches = [scenarios[i:i + batch_size] for i in range(0, len(scenarios), batch_size)]
+    base_name, extension = os.path.splitext(output_file)
+    output_files = []
+    for index, batch in enumerate(batches):
+        batch_file = output_file if len(batches) == 1 else f"{base_name}_{index}{extension}"
+        if generate_batch_testbench(batch, batch_file, clock_period, scenario_address):
+            output_files.append(batch_file)
+    return output_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack the scenarios of many workbooks into batch testbenches")
+    parser.add_argument("excel_files", nargs="+", help="workbooks holding the scenarios")
+    parser.add_argument("-o", "--output", default="batch_testbench.vhd", help="batch testbench file")
+    parser.add_argument("--orders", default="0,1", help="values of S to include, e.g. 0,1")
+    parser.add_argument("--sheets", default=None, help="regular expression selecting the scenario sheets (default: layout sheet)")
+    parser.add_argument("--batch-size", type=int, default=None, help="maximum number of scenarios per testbench")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT, help="layout file of the workbooks")
+    args = parser.parse_args(argv)
+
+    orders = [int(s) for s in args.orders.split(",")]
+    output_files = process_excel_to_batch_testbenches(args.excel_files, args.output, args.layout, orders,
+                                                      args.sheets, args.batch_size)
+    return 0 if output_files else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import ReadFromExcelAndProduceTB3
+from GenerationManifest import (DEFAULT_MANIFEST_NAME, append_entry, check_manifest, is_verified, load_manifest,
+                                output_path, work_item_key)
+from PerformanceHistory import source_version, workbook_digest
+from ScenarioLayout import DEFAULT_LAYOUT, EXPECTED_ROLES, layout_for_sheet, load_layout, parse_layout_data
+from TestbenchGenerators import GENERATORS
+from ValidateScenarioData import validate_layout_data
+from WorkbookFingerprint import sheet_fingerprints
+from WorkbookSource import is_path, open_workbook_source
+
+# This script reads a workbook holding one scenario per sheet and generates the 3rd and 5th filter testbenches of every sheet
+
+DEFAULT_SHEET_PATTERN = r"Sheet\d+"
+
+
+def extract_sheet(workbook, layout, sheet_name):
+    """Read all the roles of the layout from one sheet of an open workbook, timing the read."""
+    start = time.perf_counter()
+    extracted = {"sheet": sheet_name, "data": None, "error": None}
+    try:
+        extracted["data"] = parse_layout_data(workbook, layout_for_sheet(layout, sheet_name))
+    except Exception as e:
+        extracted["error"] = f"Failed to read column data: {str(e)}"
+    extracted["read_time"] = time.perf_counter() - start
+    return extracted
+
+
+def sheet_orders(layout):
+    """Return the values of S whose expected output is in the layout."""
+    return [s for s in GENERATORS if EXPECTED_ROLES[s] in layout["roles"]]
+
+
+def generate_sheet_testbenches(extracted, layout, output_dir, base_name, orders=None, workbook=None, workbook_hash=None):
+    """
+    Validate the data of one sheet and generate one testbench per filter order (by default every order
+    of the layout), returning one result per order. The workbook name and hash are recorded in the testbenches.
+    """
+    sheet_name = extracted["sheet"]
+    sheet_layout = layout_for_sheet(layout, sheet_name)
+    results = []
+
+    for s in sheet_orders(layout) if orders is None else orders:
+        generate_vhdl_testbench, suffix = GENERATORS[s]
+        role = EXPECTED_ROLES[s]
+        result = {"workbook": base_name, "sheet": sheet_name, "s": s, "read_time": extracted["read_time"], "generate_time": 0.0,
+                  "status": "failed", "output_file": None, "errors": []}
+        results.append(result)
+        if extracted["error"] is not None:
+            result["errors"] = [extracted["error"]]
+            continue
+
+        data = extracted["data"]
+        if data["input"].isna().all():
+            result["status"] = "skipped"
+            result["errors"] = ["no input data on this sheet"]
+            continue
+
+        start = time.perf_counter()
+        result["errors"] = validate_layout_data(sheet_layout, data, s)
+        if result["errors"]:
+            result["status"] = "invalid"
+        else:
+            safe_sheet_name = re.sub(r"\W+", "_", sheet_name)
+            output_file = os.path.join(output_dir, f"{base_name}_{safe_sheet_name}_{suffix}_testbench.vhd")
+            format_values = ReadFromExcelAndProduceTB3.format_column_values
+            if generate_vhdl_testbench(format_values(data["config"]), format_values(data["input"]),
+                                       format_values(data[role]), output_file, len(data["input"]),
+                                       workbook=f"{workbook or base_name}:{sheet_name}", workbook_hash=workbook_hash):
+                result["status"] = "generated"
+                result["output_file"] = output_file
+        result["generate_time"] = time.perf_counter() - start
+
+    return results
+
+
+def process_excel_sheets_to_testbenches(excel_file, output_dir=None, layout_file=DEFAULT_LAYOUT,
+                                        sheet_pattern=DEFAULT_SHEET_PATTERN, jobs=None, manifest_file=None, base_name=None):
+    """
+    Open the workbook once, extract every sheet whose name matches sheet_pattern concurrently
+    from the shared archive, then generate one testbench per sheet and filter order.
+    With a manifest file, every generated testbench is appended to the manifest with its hash, and the
+    sheets and orders whose testbench is already recorded and unchanged on disk, or that were recorded
+    as having no scenario, are neither read nor generated again, so an interrupted run resumes where it stopped.
+    The testbench file names start with base_name, by default the workbook file name without extension.
+    Return the list of per-sheet, per-order results.
+    """
+    layout = load_layout(layout_file)
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(excel_file)) if is_path(excel_file) else os.getcwd()
+    os.makedirs(output_dir, exist_ok=True)
+    if base_name is None:
+        base_name = os.path.splitext(os.path.basename(excel_file))[0] if is_path(excel_file) else "workbook"
+
+    manifest = load_manifest(manifest_file) if manifest_file is not None else {}
+    workbook_name = os.path.basename(excel_file) if is_path(excel_file) else "workbook"
+    workbook_hash = None
+    # The items are keyed by the fingerprint of their sheet, read from the archive directory without loading
+    # the workbook; a workbook that is not an xlsx archive is opened for its sheet names and keyed as a whole
+    fingerprints = sheet_fingerprints(excel_file)
+    if fingerprints is None:
+        workbook_hash = workbook_digest(excel_file)
+        with pd.ExcelFile(open_workbook_source(excel_file)) as workbook:
+            fingerprints = dict.fromkeys(workbook.sheet_names, workbook_hash)
+    sheet_names = [name for name in fingerprints if re.fullmatch(sheet_pattern, name)]
+    print(f"Found {len(sheet_names)} scenario sheet(s): {', '.join(sheet_names)}")
+
+    # Work items (sheet, S) still to do, and their manifest keys
+    pending, keys, results = {}, {}, []
+    for sheet_name in sheet_names:
+        for s in sheet_orders(layout):
+            if manifest_file is not None:
+                keys[sheet_name, s] = work_item_key(fingerprints[sheet_name], sheet_name, s,
+                                                    source_version(GENERATORS[s][0]), layout_for_sheet(layout, sheet_name))
+                entry = manifest.get(keys[sheet_name, s])
+                if entry is not None and is_verified(manifest_file, entry):
+                    result = {"workbook": base_name, "sheet": sheet_name, "s": s, "read_time": 0.0,
+                              "generate_time": 0.0, "status": "verified", "errors": [], "output_file": None}
+                    if entry["output_file"] is None:
+                        result.update(status="skipped", errors=["no input data on this sheet"])
+                    else:
+                        result["output_file"] = output_path(manifest_file, entry)
+                    results.append(result)
+                    continue
+            pending.setdefault(sheet_name, []).append(s)
+    if manifest_file is not None:
+        print(f"{len(results)} item(s) already completed and verified, {sum(map(len, pending.values()))} to do")
+
+    # A resumed run with nothing left to do neither hashes nor opens the workbook
+    extracted_sheets = []
+    if pending:
+        if workbook_hash is None:
+            workbook_hash = workbook_digest(excel_file)
+        with pd.ExcelFile(open_workbook_source(excel_file)) as workbook, \
+                ThreadPoolExecutor(max_workers=jobs or min(len(pending), os.cpu_count() or 1)) as executor:
+            extracted_sheets = list(executor.map(lambda name: extract_sheet(workbook, layout, name), pending))
+
+    for extracted in extracted_sheets:
+        sheet_name = extracted["sheet"]
+        for result in generate_sheet_testbenches(extracted, layout, output_dir, base_name, pending[sheet_name],
+                                                 workbook_name, workbook_hash):
+            # Sheets without scenario are recorded too, so they are not read again on resume
+            if manifest_file is not None and result["status"] in ("generated", "skipped"):
+                append_entry(manifest_file, keys[sheet_name, result["s"]], result["output_file"],
+                             workbook=excel_file if is_path(excel_file) else base_name, sheet=sheet_name, s=result["s"])
+            results.append(result)
+
+    sheet_index = {name: index for index, name in enumerate(sheet_names)}
+    results.sort(key=lambda r: (sheet_index[r["sheet"]], r["s"]))
+    return results
+
+
+def output_base_names(excel_files, output_dir=None):
+    """
+    Return the base name of the testbenches of each workbook: its file name without extension, followed by
+    a hash of its path when another workbook written to the same directory has the same name, so their
+    testbenches do not overwrite each other. The names only depend on the paths, they are stable across runs.
+    """
+    keys = [(os.path.abspath(output_dir or os.path.dirname(os.path.abspath(f))), os.path.splitext(os.path.basename(f))[0])
+            for f in excel_files]
+    counts = Counter(keys)
+    return [stem if counts[directory, stem] == 1 else f"{stem}_{hashlib.sha256(os.path.abspath(f).encode()).hexdigest()[:8]}"
+            for f, (directory, stem) in zip(excel_files, keys)]
+
+
+def print_summary(results):
+    """
+    Print the per-sheet timing and status summary. Return True if every testbench was generated or verified,
+    sheets without scenario being skipped.
+    """
+    names = [f"{r['workbook']}/{r['sheet']}" for r in results]
+    width = max([len(name) for name in names] + [len("Sheet")])
+    print(f"\n{'Sheet'.ljust(width)}  S  {'Status':<9}  {'Read [s]':>8}  {'Gen [s]':>8}  Output")
+    for name, r in zip(names, results):
+        print(f"{name.ljust(width)}  {r['s']}  {r['status'].upper():<9}  {r['read_time']:>8.2f}  "
+              f"{r['generate_time']:>8.2f}  {r['output_file'] or ''}")
+        for error in r["errors"]:
+            print(f"{''.ljust(width)}     {error}")
+
+    generated = sum(1 for r in results if r["status"] == "generated")
+    verified = sum(1 for r in results if r["status"] == "verified")
+    skipped = sum(1 for r in results if r["status"] == "skipped")
+    print(f"\n{generated}/{len(results)} testbench(es) generated" + (f", {verified} already verified" if verified else "")
+          + (f", {skipped} skipped (no scenario)" if skipped else ""))
+    return generated + verified + skipped == len(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the testbenches of every scenario sheet of one or more workbooks")
+    parser.add_argument("excel_files", nargs="+", help="workbooks holding one scenario per sheet")
+    parser.add_argument("--output-dir", default=None, help="directory of the generated testbenches")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT, help="layout file, its sheet name is ignored")
+    parser.add_argument("--sheets", default=DEFAULT_SHEET_PATTERN, help="regular expression selecting the sheets")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of sheets extracted concurrently")
+    parser.add_argument("--manifest", nargs="?", const="", default=None,
+                        help=f"record the generated testbenches in this manifest and skip the ones already recorded "
+                             f"(default: {DEFAULT_MANIFEST_NAME} in the output directory)")
+    args = parser.parse_args(argv)
+
+    manifest_file = args.manifest
+    if manifest_file == "":
+        manifest_file = os.path.join(args.output_dir or os.getcwd(), DEFAULT_MANIFEST_NAME)
+
+    excel_files = list(dict.fromkeys(args.excel_files))
+    results = []
+    for excel_file, base_name in zip(excel_files, output_base_names(excel_files, args.output_dir)):
+        # A workbook that cannot be read is reported and the run goes on with the next ones
+        try:
+            results.extend(process_excel_sheets_to_testbenches(excel_file, args.output_dir, args.layout, args.sheets,
+                                                               args.jobs, manifest_file, base_name))
+        except Exception as e:
+            print(f"Failed to process {excel_file}: {str(e)}")
+            results.append({"workbook": base_name, "sheet": "*", "s": "-", "read_time": 0.0, "generate_time": 0.0,
+                            "status": "failed", "output_file": None, "errors": [f"Failed to read the workbook: {str(e)}"]})
+    success = bool(results) and print_summary(results)
+    if manifest_file is not None and check_manifest(manifest_file):
+        success = False
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import argparse
+import itertools
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import ReadFromExcelAndProduceTB3
+from PerformanceHistory import workbook_digest
+from ScenarioLayout import DEFAULT_LAYOUT, EXPECTED_ROLES, load_layout, read_layout_data
+from TestbenchGenerators import GENERATORS
+from ValidateScenarioData import HEADER_LENGTH, MEMORY_SIZE, print_validation_errors, validate_layout_data
+from WorkbookSource import is_path
+
+# This script generates the testbenches of a parameter sweep (scenario address, clock period, S) from one parsed workbook
+
+TIME_UNITS_PS = {"fs": 0.001, "ps": 1, "ns": 1000, "us": 1000000, "ms": 1000000000}
+
+# Formatted scenario data, attached by every worker process from the shared memory block
+shared_data = {}
+
+
+def parse_integer_values(text):
+    """Parse a list of integers and inclusive ranges, e.g. "0,1234,20000:20400:100"."""
+    values = []
+    for token in text.split(","):
+        bounds = [int(bound, 0) for bound in token.strip().split(":")]
+        if len(bounds) == 1:
+            values.append(bounds[0])
+        else:
+            start, stop = bounds[0], bounds[1]
+            step = bounds[2] if len(bounds) > 2 else 1
+            values.extend(range(start, stop + 1, step))
+    return values
+
+
+def parse_clock_periods(text):
+    """Parse a list of VHDL time literals and inclusive ranges, e.g. "20ns,5:15:5 ns". Return the literals."""
+    periods = []
+    for token in text.split(","):
+        match = re.fullmatch(r"\s*([\d.:]+)\s*(fs|ps|ns|us|ms)\s*", token)
+        if match is None:
+            raise ValueError(f"Invalid clock period '{token}'")
+        bounds = [float(bound) for bound in match.group(1).split(":")]
+        if len(bounds) == 1:
+            values = bounds
+        else:
+            step = bounds[2] if len(bounds) > 2 else 1
+            count = int(round((bounds[1] - bounds[0]) / step)) + 1
+            values = [bounds[0] + i * step for i in range(count)]
+        periods.extend(f"{value:g} {match.group(2)}" for value in values)
+    return periods
+
+
+def clock_period_ps(period):
+    """Return a VHDL time literal in picoseconds."""
+    value, unit = period.split()
+    return float(value) * TIME_UNITS_PS[unit]
+
+
+def share_formatted_data(formatted):
+    """Copy the formatted strings once into a shared memory block. Return the block and the (offset, size) of each string."""
+    encoded = {name: text.encode('utf-8') for name, text in formatted.items()}
+    block = shared_memory.SharedMemory(create=True, size=max(1, sum(len(data) for data in encoded.values())))
+    slices = {}
+    offset = 0
+    for name, data in encoded.items():
+        block.buf[offset:offset + len(data)] = data
+        slices[name] = (offset, len(data))
+        offset += len(data)
+    return block, slices
+
+
+def attach_shared_data(block_name, slices):
+    """Worker initializer: attach the shared memory block and decode the formatted strings once per worker."""
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        for name, (offset, size) in slices.items():
+            shared_data[name] = bytes(block.buf[offset:offset + size]).decode('utf-8')
+    finally:
+        block.close()
+
+
+def generate_sweep_point(s, scenario_address, clock_period, scenario_length, output_file, workbook=None, workbook_hash=None):
+    """Worker task: generate the testbench of one point of the sweep from the shared data."""
+    start = time.perf_counter()
+    GENERATORS[s][0](shared_data["config"], shared_data["input"], shared_data[f"expected_s{s}"], output_file,
+                     scenario_length, clock_period=clock_period, scenario_address=scenario_address,
+                     workbook=f"{workbook} (address {scenario_address}, clock {clock_period})", workbook_hash=workbook_hash)
+    return time.perf_counter() - start
+
+
+def sweep_points(orders, scenario_addresses, clock_periods, scenario_length):
+    """
+    Return the (s, scenario_address, clock_period) points of the sweep, and the ones skipped because the scenario
+    does not fit in memory. Repeated points, including equal periods written differently ("20 ns", "20000 ps"),
+    are kept once: they would be written to the same testbench file.
+    """
+    points, skipped, seen = [], [], set()
+    for point in itertools.product(orders, scenario_addresses, clock_periods):
+        key = (point[0], point[1], clock_period_ps(point[2]))
+        if key in seen:
+            continue
+        seen.add(key)
+        fits = 0 <= point[1] and point[1] + HEADER_LENGTH + 2 * scenario_length <= MEMORY_SIZE
+        (points if fits else skipped).append(point)
+    return points, skipped
+
+
+def process_excel_to_sweep(excel_file, output_dir, orders=(0, 1), scenario_addresses=(1234,), clock_periods=("20 ns",),
+                           layout_file=DEFAULT_LAYOUT, jobs=None):
+    """
+    Parse and format the scenario data once, share it with the worker processes through shared memory
+    and generate the testbench of every (S, scenario address, clock period) combination in parallel.
+    Return the list of generated testbench files.
+    """
+    layout = load_layout(layout_file)
+    roles = ["config", "input"] + [EXPECTED_ROLES[s] for s in orders]
+    data = read_layout_data(excel_file, layout, roles)
+
+    for s in orders:
+        errors = validate_layout_data(layout, data, s, scenario_address=0)
+        if errors:
+            print_validation_errors(errors)
+            return []
+
+    scenario_length = len(data["input"])
+    points, skipped = sweep_points(orders, scenario_addresses, clock_periods, scenario_length)
+    for s, scenario_address, clock_period in skipped:
+        print(f"Skipping S={s}, address {scenario_address}: a scenario of {scenario_length} values does not fit in memory")
+
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(excel_file))[0] if is_path(excel_file) else "workbook"
+    workbook = os.path.basename(excel_file) if is_path(excel_file) else "workbook"
+    workbook_hash = workbook_digest(excel_file)
+    format_values = ReadFromExcelAndProduceTB3.format_column_values
+    block, slices = share_formatted_data({role: format_values(data[role]) for role in roles})
+
+    try:
+        print(f"Generating {len(points)} testbench(es)")
+        start = time.perf_counter()
+        output_files = [os.path.join(output_dir, f"{base_name}_S{s}_addr{address}_clk{clock_period_ps(period):g}ps_testbench.vhd")
+                        for s, address, period in points]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=attach_shared_data, initargs=(block.name, slices)) as executor:
+            futures = [executor.submit(generate_sweep_point, s, address, period, scenario_length, output_file,
+                                       workbook, workbook_hash)
+                       for (s, address, period), output_file in zip(points, output_files)]
+            for future in futures:
+                future.result()
+        print(f"Sweep of {len(points)} testbench(es) generated in {time.perf_counter() - start:.2f} s")
+    finally:
+        block.close()
+        block.unlink()
+    return output_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the testbenches of a parameter sweep from one workbook")
+    parser.add_argument("excel_file", help="workbook holding the scenario")
+    parser.add_argument("--output-dir", default="sweep", help="directory of the generated testbenches")
+    parser.add_argument("--orders", default="0,1", help="values of S, e.g. 0,1")
+    parser.add_argument("--addresses", default="1234", help="scenario addresses, e.g. 0,1234,20000:20453:151")
+    parser.add_argument("--clock-periods", default="20 ns", help="clock periods, e.g. \"20 ns,5:15:5 ns\"")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT, help="layout file of the workbook")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    try:
+        orders = parse_integer_values(args.orders)
+        if any(s not in EXPECTED_ROLES for s in orders):
+            raise ValueError(f"S must be one of {sorted(EXPECTED_ROLES)}")
+        output_files = process_excel_to_sweep(args.excel_file, args.output_dir, orders, parse_integer_values(args.addresses),
+                                              parse_clock_periods(args.clock_periods), args.layout, args.jobs)
+    except Exception as e:
+        print(f"An unexpected error occurred: {str(e)}")
+        return 1
+    return 0 if output_files else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,44 @@
 import pandas as pd
+import io
 import os
-import shutil
+import time
+
+from DutInstrumentation import instrumentation_process
+from PerformanceHistory import provenance_header, record_generation, source_version, workbook_digest
+from ScenarioLayout import DEFAULT_LAYOUT, load_layout, read_layout_data
+from SharedScenarioPackage import generate_vhdl_package, package_name_for, package_references
+from ValidateScenarioData import print_validation_errors, validate_layout_data
+from WorkbookSource import is_path
 
 # This script reads data from an Excel file and generates a VHDL 3rd filter testbench
 
-def process_excel_column(excel_file, column, start_row, end_row, sheet_name="Sheet1"):
+def format_column_values(values):
+    """Return the values as a comma-separated string suitable for a VHDL aggregate"""
+    # Format values - convert to integers if they are whole numbers to avoid ".0" suffix
+    formatted_values = []
+    for val in values:
+        if isinstance(val, (int, float)) and float(val).is_integer():
+            formatted_values.append(str(int(val)))
+        else:
+            formatted_values.append(str(val))
+
+    return ", ".join(formatted_values)
+
+def generate_vhdl_testbench(config_header_data, input_data, output_data, output_file, scenario_length=22533,
+                            instrument_report=None, clock_period="20 ns", scenario_address=1234, workbook=None,
+                            workbook_hash=None):
     """
-    Read numeric data from a specific column and row range of an Excel file
-    and return as a comma-separated string with proper formatting.
+    Generate complete VHDL testbench with the provided data.
+    output_file is either a file name or a writable text stream.
+    With instrument_report set, the testbench counts the DUT clock cycles and memory accesses
+    and writes them to that report file during the simulation.
+    clock_period (a VHDL time literal) and scenario_address set the corresponding testbench constants.
+    The name and hash of the workbook, and the version of this template, are recorded in the header comment
+    so the performance history can key the simulations of the testbench.
     """
-    try:
-        print(f"Reading Excel file: {excel_file}, sheet: {sheet_name}, column {column}, rows {start_row}-{end_row}")
-        df = pd.read_excel(excel_file, sheet_name=sheet_name, usecols=column, skiprows=start_row-1, nrows=end_row-start_row+1)
-        values = df.iloc[:, 0].tolist()
-
-        # Format values - convert to integers if they are whole numbers to avoid ".0" suffix
-        formatted_values = []
-        for val in values:
-            if isinstance(val, (int, float)) and float(val).is_integer():
-                formatted_values.append(str(int(val)))
-            else:
-                formatted_values.append(str(val))
-
-        formatted_line = ", ".join(formatted_values)
-        return formatted_line
-    except Exception as e:
-        print(f"An error occurred while reading column {column}: {str(e)}")
-        return None
-
-def generate_vhdl_testbench(config_header_data, input_data, output_data, output_file):
-    """Generate complete VHDL testbench with the provided data"""
 
     tb_template = """-- TB EXAMPLE PFRL 2024-2025
-
+{provenance}
 library ieee;
 use ieee.std_logic_1164.all;
 use ieee.numeric_std.all;
@@ -43,7 +49,7 @@ end tb2425;
 
 architecture project_tb_arch of tb2425 is
 
-    constant CLOCK_PERIOD : time := 20 ns;
+    constant CLOCK_PERIOD : time := {clock_period};
 
     -- Signals to be connected to the component
     signal tb_clk : std_logic := '0';
@@ -62,7 +68,7 @@ architecture project_tb_arch of tb2425 is
 
     -- Scenario
     type scenario_config_type is array (0 to 16) of integer;
-    constant SCENARIO_LENGTH : integer := 22533;
+    constant SCENARIO_LENGTH : integer := {scenario_length};
     constant SCENARIO_LENGTH_STL : std_logic_vector(15 downto 0) := std_logic_vector(to_unsigned(SCENARIO_LENGTH, 16));
     type scenario_type is array (0 to SCENARIO_LENGTH-1) of integer;
 
@@ -77,7 +83,7 @@ architecture project_tb_arch of tb2425 is
     signal memory_control : std_logic := '0';      -- A signal to decide when the memory is accessed
                                                    -- by the testbench or by the project
 
-    constant SCENARIO_ADDRESS : integer := 1234;    -- This value may arbitrarily change
+    constant SCENARIO_ADDRESS : integer := {scenario_address};    -- This value may arbitrarily change
 
     component project_reti_logiche is
         port (
@@ -236,58 +242,96 @@ begin
 
         assert false report "Simulation Ended! TEST PASSATO (EXAMPLE)" severity failure;
     end process;
-
+{instrumentation}
 end architecture;
 """
     # Format the template with the data
+    provenance = {"workbook": workbook, "workbook_hash": workbook_hash,
+                  "template_version": source_version(generate_vhdl_testbench)}
     vhdl_content = tb_template.format(
+        provenance=provenance_header(**provenance),
         config_header_data=config_header_data,
         input_data=input_data,
-        output_data=output_data
+        output_data=output_data,
+        scenario_length=scenario_length,
+        clock_period=clock_period,
+        scenario_address=scenario_address,
+        instrumentation=instrumentation_process(instrument_report, provenance)
     )
 
-    # Write to file
+    # Write to stream or file
+    if hasattr(output_file, "write"):
+        output_file.write(vhdl_content)
+        print("VHDL testbench written to stream successfully")
+        return True
+
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(vhdl_content)
 
     print(f"VHDL testbench file created successfully: {output_file}")
     return True
 
-def process_excel_to_testbench(excel_file, output_file=None):
-    """Process required Excel data and generate a complete VHDL testbench file"""
+def process_excel_to_testbench(excel_file, output_file=None, layout_file=DEFAULT_LAYOUT, return_stream=False,
+                               package_file=None, instrument_report=None, history_file=None, parse_cache_dir=None,
+                               package_name=None):
+    """
+    Process required Excel data and generate a complete VHDL testbench file.
+    The location of the data in the workbook is described by the layout file.
+    excel_file is a file name or an in-memory workbook: bytes, a memory-mapped buffer or an open binary stream.
+    With return_stream=True nothing is written to disk and the testbench is returned as a text stream.
+    With package_file set, the config header and input vector are written once into that shared VHDL package
+    and the testbench only holds S and the expected output. The package is named after its file unless
+    package_name is given.
+    With instrument_report set, the testbench writes the DUT performance counters to that report file.
+    With history_file set, the generation time and testbench size are appended to that performance history.
+    With parse_cache_dir set, the data parsed from the workbook is reused until the sheet it comes from changes.
+    """
+    start = time.perf_counter()
     try:
-        # First, try copying the file to a temporary location if it's in a restricted area
-        if excel_file.startswith('/Users') and ('Downloads' in excel_file or 'Desktop' in excel_file):
-            temp_file = os.path.join(os.getcwd(), os.path.basename(excel_file))
-            print(f"Copying file to temporary location: {temp_file}")
-            try:
-                shutil.copy2(excel_file, temp_file)
-                excel_file = temp_file
-                print("File copied successfully")
-            except Exception as e:
-                print(f"Could not copy file: {e}")
-                # Continue with original file
+        if return_stream:
+            output_file = io.StringIO()
 
         # Default output filename if not provided
         if output_file is None:
-            base_name = os.path.splitext(excel_file)[0]
+            base_name = os.path.splitext(excel_file)[0] if is_path(excel_file) else "workbook"
             output_file = f"{base_name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}_testbench.vhd"
 
-        # Process column B from Sheet2 (rows 14-27) for config header
-        config_header_data = process_excel_column(excel_file, "B", 13, 26, "Sheet2")
-
-        # Process column C from Sheet2 (rows 13-22545) for input scenario
-        input_data = process_excel_column(excel_file, "C", 13, 22545, "Sheet2")
-
-        # Process column D from Sheet2 (rows 13-22545) for output scenario
-        output_data = process_excel_column(excel_file, "D", 13, 22545, "Sheet2")
+        try:
+            # Config header, input scenario and output scenario of the 3rd order filter (S=0)
+            layout = load_layout(layout_file)
+            roles = ("config", "input", "expected_s0")
+            data = read_layout_data(excel_file, layout, roles, parse_cache_dir)
+            config_values, input_values, output_values = (data[role] for role in roles)
+        except Exception as e:
+            print(f"Failed to read column data: {str(e)}")
+            return False
 
-        if config_header_data is None or input_data is None or output_data is None:
-            print("Failed to read column data.")
+        # Check the data before emitting it, a bad cell would only show up during the simulation
+        errors = validate_layout_data(layout, data, 0)
+        if errors:
+            print_validation_errors(errors)
             return False
 
+        config_header_data = format_column_values(config_values)
+        input_data = format_column_values(input_values)
+        if package_file is not None:
+            package_name = package_name or package_name_for(package_file)
+            generate_vhdl_package(config_header_data, input_data, len(input_values), package_file, package_name)
+            config_header_data, input_data = package_references(package_name)
+
         # Generate the complete VHDL testbench
-        return generate_vhdl_testbench(config_header_data, input_data, output_data, output_file)
+        workbook = os.path.basename(excel_file) if is_path(excel_file) else "workbook"
+        workbook_hash = workbook_digest(excel_file)
+        generated = generate_vhdl_testbench(config_header_data, input_data, format_column_values(output_values),
+                                            output_file, len(input_values), instrument_report,
+                                            workbook=workbook, workbook_hash=workbook_hash)
+        if generated and history_file is not None:
+            record_generation(history_file, excel_file, output_file, 0, time.perf_counter() - start,
+                              generate_vhdl_testbench, workbook_hash=workbook_hash)
+        if return_stream:
+            output_file.seek(0)
+            return output_file
+        return generated
 
     except Exception as e:
         print(f"An unexpected error occurred: {str(e)}")
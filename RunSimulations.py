@@ -0,0 +1,302 @@
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PerformanceHistory import DEFAULT_HISTORY_FILE, record_simulation
+from SimulationCache import DEFAULT_CACHE_SIZE, cache_key, load_result, store_result
+
+# This script runs the generated VHDL testbenches against the DUT sources on a pool of local cores
+
+PASS_MARKER = "TEST PASSATO"
+FAIL_MARKER = "TEST FALLITO"
+
+# VHDL standard names as accepted by the nvc --std option
+NVC_STANDARDS = {"93": "1993", "02": "2002", "08": "2008", "19": "2019"}
+
+
+def find_top_entity(testbench_file):
+    """Return the name of the first entity declared in a testbench file."""
+    with open(testbench_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    match = re.search(r"^\s*entity\s+(\w+)\s+is\b", content, re.IGNORECASE | re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def run_steps(steps, work_dir, timeout=None):
+    """
+    Run the simulator commands one after the other inside the work directory.
+    Every step but the last one must succeed: the simulation step always exits with
+    an error because the testbench ends on an 'assert false ... severity failure'.
+    """
+    outputs = []
+    for stage, command in steps:
+        try:
+            completed = subprocess.run(command, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       universal_newlines=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            outputs.append(f"[{stage}] timed out after {timeout} s")
+            return stage, "\n".join(outputs)
+        outputs.append(f"[{stage}] {' '.join(command)}\n{completed.stdout}")
+        if completed.returncode != 0 and stage != "simulation":
+            return stage, "\n".join(outputs)
+    return None, "\n".join(outputs)
+
+
+def analyse_ghdl(source_files, work_dir, options):
+    """Analyse VHDL sources into the GHDL work library of the work directory."""
+    command = ["ghdl", "-a", f"--std={options.get('std', '08')}", f"--workdir={work_dir}"] + list(source_files)
+    return run_steps([("analysis", command)], work_dir, options.get("timeout"))
+
+
+def run_ghdl(testbench_file, dut_files, work_dir, top, options):
+    """Analyse, elaborate and simulate a testbench with GHDL."""
+    common = [f"--std={options.get('std', '08')}", f"--workdir={work_dir}"]
+    steps = [
+        ("analysis", ["ghdl", "-a"] + common + list(dut_files) + [testbench_file]),
+        ("elaboration", ["ghdl", "-e"] + common + [top]),
+        ("simulation", ["ghdl", "-r"] + common + [top] + list(options.get("run_args", []))),
+    ]
+    return run_steps(steps, work_dir, options.get("timeout"))
+
+
+def analyse_nvc(source_files, work_dir, options):
+    """Analyse VHDL sources into the nvc work library of the work directory."""
+    std = NVC_STANDARDS.get(options.get('std', '08'), options.get('std', '08'))
+    command = ["nvc", f"--std={std}", f"--work=work:{os.path.join(work_dir, 'work')}", "-a"] + list(source_files)
+    return run_steps([("analysis", command)], work_dir, options.get("timeout"))
+
+
+def run_nvc(testbench_file, dut_files, work_dir, top, options):
+    """Analyse, elaborate and simulate a testbench with nvc."""
+    std = NVC_STANDARDS.get(options.get('std', '08'), options.get('std', '08'))
+    common = [f"--std={std}", f"--work=work:{os.path.join(work_dir, 'work')}"]
+    steps = [
+        ("analysis", ["nvc"] + common + ["-a"] + list(dut_files) + [testbench_file]),
+        ("elaboration", ["nvc"] + common + ["-e", top]),
+        ("simulation", ["nvc"] + common + ["-r", top] + list(options.get("run_args", []))),
+    ]
+    return run_steps(steps, work_dir, options.get("timeout"))
+
+
+def run_fake(testbench_file, dut_files, work_dir, top, options):
+    """
+    Pretend to simulate a testbench without any simulator installed, so the runner itself can be tested.
+    The outcome is chosen with the 'fake_outcome' option (pass, fail or error).
+    """
+    time.sleep(float(options.get("fake_delay", 0)))
+    outcome = options.get("fake_outcome", "pass")
+    if outcome == "error":
+        return "analysis", f"[analysis] {testbench_file}: syntax error (fake backend)"
+    if outcome == "fail":
+        return None, f"[simulation] {top}: (assertion failure): TEST FALLITO @ OFFSET=17 expected= 0 actual=1 (fake backend)"
+
+    with open(testbench_file, 'r', encoding='utf-8') as f:
+        match = re.search(r'report\s+"([^"]*' + PASS_MARKER + r'[^"]*)"', f.read())
+    report = match.group(1) if match else f"Simulation Ended! {PASS_MARKER}"
+    return None, f"[simulation] {top}: (assertion failure): {report} (fake backend)"
+
+
+# Simulator backends: name -> (executable to look for, runner function, analysis function of the shared DUT library)
+BACKENDS = {
+    "ghdl": ("ghdl", run_ghdl, analyse_ghdl),
+    "nvc": ("nvc", run_nvc, analyse_nvc),
+    "fake": (None, run_fake, None),
+}
+
+
+class SharedLibrary:
+    """
+    Work library holding the DUT sources (and shared data packages) analysed once, on first use.
+    The work directory of each testbench starts as a copy of it, so only the testbench is analysed per run.
+    """
+
+    def __init__(self, dut_files, backend, options=None):
+        self.dut_files = [os.path.abspath(f) for f in dut_files]
+        self.backend = backend
+        self.options = options or {}
+        self.lock = threading.Lock()
+        self.analysed = False
+        self.work_dir = None
+        self.failed_stage = None
+        self.log = ""
+
+    def analyse(self):
+        """Analyse the DUT sources if not done yet. Return (failed_stage, log) of the analysis."""
+        with self.lock:
+            if not self.analysed:
+                self.analysed = True
+                self.work_dir = tempfile.mkdtemp(prefix="dut_")
+                try:
+                    self.failed_stage, self.log = BACKENDS[self.backend][2](self.dut_files, self.work_dir, self.options)
+                except OSError as e:
+                    self.failed_stage, self.log = "analysis", f"[analysis] {str(e)}"
+            return self.failed_stage, self.log
+
+    def copy_to(self, work_dir):
+        """Copy the analysed library into the work directory of a testbench."""
+        shutil.copytree(self.work_dir, work_dir, dirs_exist_ok=True)
+
+    def remove(self):
+        if self.work_dir is not None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def parse_simulation_log(log):
+    """
+    Turn a simulator transcript into a (status, message) pair by looking
+    for the "TEST PASSATO" / "TEST FALLITO" reports of the testbench.
+    """
+    for line in log.splitlines():
+        if FAIL_MARKER in line:
+            return "failed", line[line.index(FAIL_MARKER):].strip()
+    for line in log.splitlines():
+        if PASS_MARKER in line:
+            return "passed", line[line.index(PASS_MARKER):].strip()
+    return "error", "Simulation ended without a TEST PASSATO / TEST FALLITO report"
+
+
+def run_testbench(testbench_file, dut_files, backend="ghdl", options=None, log_dir=None, cache_dir=None,
+                  cache_size=DEFAULT_CACHE_SIZE, shared_library=None):
+    """
+    Run a single testbench in its own work directory and return a result dictionary.
+    With a cache directory, a simulation whose testbench, DUT sources and options did not change is not run again.
+    With a shared library (see SharedLibrary) of the DUT sources, they are not analysed again for this testbench.
+    """
+    options = options or {}
+    executable, runner, _ = BACKENDS[backend]
+    result = {"testbench": testbench_file, "backend": backend, "status": "error", "message": "", "runtime": 0.0,
+              "log": "", "cached": False}
+
+    start = time.perf_counter()
+    key = None
+    try:
+        if cache_dir is not None:
+            key = cache_key(testbench_file, dut_files, backend, options)
+            cached = load_result(cache_dir, key)
+            if cached is not None:
+                result.update(status=cached["status"], message=cached["message"], log=cached["log"], cached=True)
+                return result
+
+        if executable is not None and shutil.which(executable) is None:
+            result["message"] = f"Simulator '{executable}' not found in PATH"
+            return result
+
+        top = find_top_entity(testbench_file)
+        if top is None:
+            result["message"] = f"No entity declaration found in {testbench_file}"
+            return result
+
+        # Each testbench gets its own work library, all testbenches declare the same entity name
+        use_library = shared_library is not None and bool(dut_files)
+        if use_library:
+            failed_stage, log = shared_library.analyse()
+            if failed_stage is not None:
+                result.update(message=f"DUT {failed_stage} failed", log=log)
+                return result
+        work_dir = tempfile.mkdtemp(prefix=f"{top}_")
+        try:
+            if use_library:
+                shared_library.copy_to(work_dir)
+            sources = [] if use_library else [os.path.abspath(f) for f in dut_files]
+            failed_stage, log = runner(os.path.abspath(testbench_file), sources, work_dir, top, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        result["log"] = log
+        if failed_stage is not None:
+            result["message"] = f"{failed_stage} failed"
+        else:
+            result["status"], result["message"] = parse_simulation_log(log)
+
+        if key is not None:
+            result["runtime"] = time.perf_counter() - start
+            store_result(cache_dir, key, result, cache_size)
+    except Exception as e:
+        result["message"] = f"An error occurred while running the simulator: {str(e)}"
+    finally:
+        result["runtime"] = time.perf_counter() - start
+
+        if log_dir is not None:
+            os.makedirs(log_dir, exist_ok=True)
+            log_file = os.path.join(log_dir, os.path.splitext(os.path.basename(testbench_file))[0] + ".log")
+            with open(log_file, 'w', encoding='utf-8') as f:
+                f.write(result["log"])
+
+    return result
+
+
+def run_testbenches(testbench_files, dut_files, backend="ghdl", jobs=None, options=None, log_dir=None, cache_dir=None,
+                    cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Run every testbench against the DUT sources, in parallel on `jobs` workers
+    (all local cores by default). The DUT sources, including a shared data package, are analysed once
+    into a library every testbench starts from. Results are returned in the order of the testbenches.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown simulator backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+
+    jobs = jobs or os.cpu_count() or 1
+    print(f"Running {len(testbench_files)} testbench(es) with {backend} on {jobs} worker(s)")
+
+    shared_library = SharedLibrary(dut_files, backend, options) if BACKENDS[backend][2] is not None else None
+    try:
+        # The simulators run as subprocesses, so threads are enough to keep every core busy
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(run_testbench, tb, dut_files, backend, options, log_dir, cache_dir, cache_size,
+                                       shared_library)
+                       for tb in testbench_files]
+            return [future.result() for future in futures]
+    finally:
+        if shared_library is not None:
+            shared_library.remove()
+
+
+def print_summary(results):
+    """Print a pass/fail summary with per-testbench runtimes and return True if everything passed."""
+    width = max([len(r["testbench"]) for r in results] + [len("Testbench")])
+    print(f"\n{'Testbench'.ljust(width)}  {'Status':<7}  {'Time [s]':>9}  Message")
+    for r in results:
+        message = f"(cached) {r['message']}" if r.get("cached") else r["message"]
+        print(f"{r['testbench'].ljust(width)}  {r['status'].upper():<7}  {r['runtime']:>9.2f}  {message}")
+
+    passed = sum(1 for r in results if r["status"] == "passed")
+    hits = sum(1 for r in results if r.get("cached"))
+    total_time = sum(r["runtime"] for r in results)
+    print(f"\n{passed}/{len(results)} testbench(es) passed, {hits} cache hit(s), total simulation time {total_time:.2f} s")
+    return passed == len(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run generated VHDL testbenches on a local simulator")
+    parser.add_argument("testbenches", nargs="+", help="generated testbench .vhd files")
+    parser.add_argument("--dut", nargs="+", default=[], help="VHDL sources of the design under test")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="ghdl", help="simulator backend")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of parallel simulations (default: all cores)")
+    parser.add_argument("--std", default="08", help="VHDL standard (93, 02, 08, 19)")
+    parser.add_argument("--timeout", type=float, default=None, help="timeout in seconds for each simulator step")
+    parser.add_argument("--log-dir", default=None, help="directory where the simulator transcripts are saved")
+    parser.add_argument("--cache-dir", default=None, help="reuse the results of unchanged simulations stored in this directory")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_SIZE / 2**20, help="cache size cap in MB (default: 256)")
+    parser.add_argument("--history", nargs="?", const=DEFAULT_HISTORY_FILE, default=None,
+                        help="record the simulation times in the performance history (SQLite file)")
+    parser.add_argument("--history-label", default=None, help="label of the recorded runs, e.g. a commit id")
+    args = parser.parse_args(argv)
+
+    options = {"std": args.std, "timeout": args.timeout}
+    results = run_testbenches(args.testbenches, args.dut, args.backend, args.jobs, options, args.log_dir,
+                              args.cache_dir, int(args.cache_size * 2**20))
+    if args.history is not None:
+        for result in results:
+            record_simulation(args.history, result, args.history_label)
+    return 0 if print_summary(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
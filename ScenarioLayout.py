@@ -0,0 +1,142 @@
+import json
+import os
+import re
+
+import pandas as pd
+
+from WorkbookFingerprint import load_parsed_data, parse_cache_key, store_parsed_data, workbook_fingerprint
+from WorkbookSource import open_workbook_source
+
+# This script describes where the scenario data lives in the Excel file and reads it with as few sheet passes as possible
+
+DEFAULT_LAYOUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts", "progetto2425.json")
+
+REQUIRED_ROLES = ("config", "input")
+EXPECTED_ROLES = {0: "expected_s0", 1: "expected_s1"}     # S -> role holding the expected output
+
+
+def column_index(column):
+    """Return the 1-based index of a spreadsheet column name (A -> 1, Z -> 26, AA -> 27)."""
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
+
+
+def load_layout(layout_file=DEFAULT_LAYOUT):
+    """
+    Load a layout description file. Each role declares its column and the first and last
+    spreadsheet rows holding its values, the sheet is inherited from the layout unless the role overrides it.
+    """
+    with open(layout_file, 'r', encoding='utf-8') as f:
+        layout = json.load(f)
+
+    roles = layout.get("roles", {})
+    for role in REQUIRED_ROLES:
+        if role not in roles:
+            raise ValueError(f"Layout {layout_file} does not declare the '{role}' role")
+
+    for role, location in roles.items():
+        location.setdefault("sheet", layout.get("sheet"))
+        if location["sheet"] is None:
+            raise ValueError(f"Layout {layout_file}: role '{role}' has no sheet")
+        if not re.fullmatch(r"[A-Z]+", str(location.get("column", ""))):
+            raise ValueError(f"Layout {layout_file}: role '{role}' has an invalid column {location.get('column')!r}")
+        first_row, last_row = location.get("rows", (0, 0))
+        if not 1 <= first_row <= last_row:
+            raise ValueError(f"Layout {layout_file}: role '{role}' has an invalid row range {location.get('rows')!r}")
+
+    return layout
+
+
+def role_location(layout, role):
+    """Return the (sheet_name, column, first_row) of a role, as used to name the cells at fault."""
+    location = layout["roles"][role]
+    return location["sheet"], location["column"], location["rows"][0]
+
+
+def compile_read_plan(layout, roles=None):
+    """
+    Compile the layout into a read plan: a list of sheet passes, each one covering a block of rows
+    and the union of the columns of the roles it serves. Row ranges of the same sheet are merged
+    whether they overlap, touch or not, because a sheet is streamed from its first row on every pass
+    and reading the rows in between costs less than streaming the sheet again.
+    """
+    roles = list(layout["roles"]) if roles is None else list(roles)
+    missing = [role for role in roles if role not in layout["roles"]]
+    if missing:
+        raise ValueError(f"Layout does not declare the role(s): {', '.join(missing)}")
+
+    passes = {}
+    for role in roles:
+        location = layout["roles"][role]
+        first_row, last_row = location["rows"]
+        read_pass = passes.setdefault(location["sheet"], {
+            "sheet": location["sheet"], "first_row": first_row, "last_row": last_row, "columns": [], "roles": []
+        })
+        read_pass["first_row"] = min(read_pass["first_row"], first_row)
+        read_pass["last_row"] = max(read_pass["last_row"], last_row)
+        if location["column"] not in read_pass["columns"]:
+            read_pass["columns"].append(location["column"])
+        read_pass["roles"].append(role)
+
+    # Columns in sheet order, which is the order pandas returns them in
+    for read_pass in passes.values():
+        read_pass["columns"].sort(key=column_index)
+    return list(passes.values())
+
+
+def layout_for_sheet(layout, sheet_name):
+    """Return a copy of the layout with every role moved to the given sheet, for workbooks holding one scenario per sheet."""
+    roles = {role: dict(location, sheet=sheet_name) for role, location in layout["roles"].items()}
+    return dict(layout, sheet=sheet_name, roles=roles)
+
+
+def parse_layout_data(workbook, layout, roles=None):
+    """
+    Read the values of the requested roles (all of them by default) from an open pandas.ExcelFile,
+    following the compiled read plan. Return a dictionary role -> pandas Series.
+    """
+    read_plan = compile_read_plan(layout, roles)
+    print(f"Read plan: {len(read_plan)} sheet pass(es) for {sum(len(p['roles']) for p in read_plan)} role(s)")
+
+    data = {}
+    for read_pass in read_plan:
+        first_row, last_row = read_pass["first_row"], read_pass["last_row"]
+        print(f"Reading sheet: {read_pass['sheet']}, columns {','.join(read_pass['columns'])}, rows {first_row}-{last_row}")
+        df = workbook.parse(sheet_name=read_pass["sheet"], header=None, usecols=",".join(read_pass["columns"]),
+                            skiprows=first_row-1, nrows=last_row-first_row+1)
+
+        for role in read_pass["roles"]:
+            location = layout["roles"][role]
+            position = read_pass["columns"].index(location["column"])
+            start, end = location["rows"][0] - first_row, location["rows"][1] - first_row + 1
+            data[role] = df.iloc[start:end, position].reset_index(drop=True)
+    return data
+
+
+def read_layout_data(excel_file, layout, roles=None, cache_dir=None):
+    """
+    Open the workbook and read the values of the requested roles, see parse_layout_data.
+    `excel_file` is a path or an in-memory workbook (see WorkbookSource).
+    With a cache directory the parsed data is reused as long as the sheets read and the shared strings
+    are unchanged in the archive, whatever else is edited in the workbook.
+    """
+    roles = list(layout["roles"]) if roles is None else list(roles)
+    key = None
+    if cache_dir is not None:
+        sheet_names = sorted({layout["roles"][role]["sheet"] for role in roles})
+        fingerprint = workbook_fingerprint(excel_file, sheet_names)
+        if fingerprint is not None:
+            key = parse_cache_key(fingerprint, layout, roles)
+            data = load_parsed_data(cache_dir, key)
+            if data is not None:
+                print(f"Sheet(s) {', '.join(sheet_names)} unchanged, reusing the parsed data")
+                return data
+
+    with pd.ExcelFile(open_workbook_source(excel_file)) as workbook:
+        data = parse_layout_data(workbook, layout, roles)
+
+    if key is not None:
+        store_parsed_data(cache_dir, key, data)
+    return data
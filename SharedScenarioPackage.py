@@ -0,0 +1,71 @@
+import os
+import re
+
+# This script writes the config header and input vector of a scenario into a VHDL package shared by the 3rd and 5th filter testbenches
+
+PACKAGE_NAME = "scenario_data_pkg"
+PACKAGE_FILE_NAME = f"{PACKAGE_NAME}.vhd"
+
+PACKAGE_TEMPLATE = """-- SCENARIO DATA PACKAGE PFRL 2024-2025
+-- Config header and input vector shared by the S=0 and S=1 testbenches
+
+package {package_name} is
+
+    constant SCENARIO_DATA_LENGTH : integer := {scenario_length};
+
+    type scenario_coefficients_type is array (0 to 13) of integer;
+    type scenario_data_type is array (0 to SCENARIO_DATA_LENGTH-1) of integer;
+
+    constant SCENARIO_COEFFICIENTS : scenario_coefficients_type := ( {config_header_data} );    -- C1-C14
+    constant SCENARIO_INPUT : scenario_data_type := ( {input_data} );
+
+end package {package_name};
+"""
+
+
+def package_name_for(package_file):
+    """
+    Derive the name of the package from its file name (progetto2425_pkg.vhd -> progetto2425_pkg), so the packages
+    of different workbooks, written to different files, can live in the same library.
+    """
+    name = os.path.splitext(os.path.basename(package_file))[0].lower()
+    name = re.sub(r"_+", "_", re.sub(r"\W", "_", name)).strip("_")
+    return name if re.match(r"[a-z]", name) else f"pkg_{name}".rstrip("_")
+
+
+def generate_vhdl_package(config_header_data, input_data, scenario_length, package_file, package_name=None):
+    """
+    Write the shared data package, named after its file unless package_name is given. The file is left
+    untouched when its content does not change, so generating the second testbench of a workbook
+    does not make the simulator analyse it again.
+    """
+    package_name = package_name or package_name_for(package_file)
+    vhdl_content = PACKAGE_TEMPLATE.format(
+        package_name=package_name,
+        scenario_length=scenario_length,
+        config_header_data=config_header_data,
+        input_data=input_data
+    )
+
+    if os.path.exists(package_file):
+        with open(package_file, 'r', encoding='utf-8') as f:
+            if f.read() == vhdl_content:
+                print(f"VHDL data package is up to date: {package_file}")
+                return True
+
+    with open(package_file, 'w', encoding='utf-8') as f:
+        f.write(vhdl_content)
+
+    print(f"VHDL data package file created successfully: {package_file}")
+    return True
+
+
+def package_references(package_name=PACKAGE_NAME):
+    """
+    Return the (config_header_data, input_data) to put in the testbench template instead of the values:
+    selected names of the package constants, so the testbench needs no use clause and its own
+    scenario_input signal does not clash with the package constant.
+    """
+    config_header_data = ", ".join(f"work.{package_name}.SCENARIO_COEFFICIENTS({i})" for i in range(14))
+    input_data = f"scenario_type(work.{package_name}.SCENARIO_INPUT)"
+    return config_header_data, input_data
@@ -0,0 +1,144 @@
+import argparse
+import os
+import re
+import shutil
+import sys
+
+import numpy as np
+
+import ReadFromExcelAndProduceTB3
+from FilterReferenceModel import FILTER_RADIUS, filter_scenario
+from RunSimulations import BACKENDS, run_testbench, run_testbenches
+from ScenarioLayout import DEFAULT_LAYOUT, EXPECTED_ROLES, load_layout, read_layout_data
+from TestbenchGenerators import GENERATORS
+from ValidateScenarioData import HEADER_LENGTH, print_validation_errors, validate_layout_data
+
+# This script shrinks a failing scenario to the smallest testbench that still makes the DUT fail
+
+SMALLEST_WINDOW = 8
+
+
+def first_mismatch_index(message, scenario_length):
+    """Return the scenario index of the first mismatch from a "TEST FALLITO @ OFFSET=..." report, or None."""
+    match = re.search(r"OFFSET=(\d+)", message)
+    if match is None:
+        return None
+    index = int(match.group(1)) - HEADER_LENGTH - scenario_length
+    return index if 0 <= index < scenario_length else None
+
+
+def candidate_ranges(start, end, mismatch):
+    """
+    Return the (start, end) ranges to try next, smallest first, for a failing range whose first
+    mismatch is at absolute index `mismatch` (None when the failure is not tied to an output value).
+    The prefix up to the mismatch keeps the history the DUT saw, the windows of growing size
+    ending on the mismatch drop it. Every candidate is strictly shorter than the failing range.
+    """
+    if mismatch is None:
+        # Failure before any output check (e.g. on o_done): try shorter prefixes
+        candidates = {(start, start + size) for size in (2 ** k for k in range(3, 17)) if size < end - start}
+        return sorted(candidates, key=lambda r: r[1] - r[0])
+
+    # The output at the mismatch depends on the inputs up to mismatch + FILTER_RADIUS
+    last = min(end, mismatch + FILTER_RADIUS + 1)
+    candidates = {(start, last)}
+    size = SMALLEST_WINDOW
+    while last - size > start:
+        candidates.add((last - size, last))
+        size *= 2
+    candidates.discard((start, end))
+    return sorted(candidates, key=lambda r: r[1] - r[0])
+
+
+def write_candidate(config_values, input_values, s, start, end, work_dir):
+    """Generate the testbench of input_values[start:end] with its expected output recomputed by the reference model."""
+    inputs = input_values[start:end]
+    expected = filter_scenario(config_values, inputs, s)
+    format_values = ReadFromExcelAndProduceTB3.format_column_values
+    output_file = os.path.join(work_dir, f"candidate_S{s}_{start}_{end}.vhd")
+    GENERATORS[s][0](format_values(config_values), format_values(inputs), format_values(expected), output_file, end - start)
+    return output_file
+
+
+def shrink_scenario(excel_file, dut_files, s=0, output_file=None, layout_file=DEFAULT_LAYOUT, backend="ghdl",
+                    jobs=None, options=None, work_dir="shrink_work", cache_dir=None):
+    """
+    Shrink the failing scenario of a workbook: generate progressively shorter candidate testbenches
+    (prefixes and windows around the first mismatch), simulate them in parallel and keep the smallest
+    one that still fails, until no shorter candidate fails. Return the result of the smallest failing
+    testbench, copied to output_file, or None if the full scenario does not fail.
+    """
+    layout = load_layout(layout_file)
+    role = EXPECTED_ROLES[s]
+    data = read_layout_data(excel_file, layout, ("config", "input", role))
+    errors = validate_layout_data(layout, data, s)
+    if errors:
+        print_validation_errors(errors)
+        return None
+
+    config_values = data["config"].to_numpy(dtype=np.int64)
+    input_values = data["input"].to_numpy(dtype=np.int64)
+    expected_values = data[role].to_numpy(dtype=np.int64)
+
+    # The candidates are only meaningful if the model agrees with the workbook on the full scenario
+    model_values = filter_scenario(config_values, input_values, s)
+    disagreements = np.flatnonzero(model_values != expected_values)
+    if disagreements.size:
+        i = int(disagreements[0])
+        print(f"The reference model disagrees with the workbook on {disagreements.size} value(s), first at index {i}: "
+              f"expected {expected_values[i]}, model {model_values[i]}")
+        return None
+
+    os.makedirs(work_dir, exist_ok=True)
+    start, end = 0, len(input_values)
+    best_file = write_candidate(config_values, input_values, s, start, end, work_dir)
+    best = run_testbench(best_file, dut_files, backend, options, cache_dir=cache_dir)
+    if best["status"] != "failed":
+        print(f"The full scenario does not fail ({best['status']}: {best['message']}), nothing to shrink")
+        return None
+
+    while True:
+        relative = first_mismatch_index(best["message"], end - start)
+        mismatch = None if relative is None else start + relative
+        print(f"Failing range {start}-{end} ({end - start} samples), first mismatch at {mismatch}")
+
+        candidates = candidate_ranges(start, end, mismatch)
+        if not candidates:
+            break
+        files = [write_candidate(config_values, input_values, s, a, b, work_dir) for a, b in candidates]
+        results = run_testbenches(files, dut_files, backend, jobs, options, cache_dir=cache_dir)
+
+        failing = [(b - a, (a, b), result) for (a, b), result in zip(candidates, results) if result["status"] == "failed"]
+        if not failing:
+            break
+        _, (start, end), best = min(failing, key=lambda f: f[0])
+
+    print(f"Smallest failing testbench: {best['testbench']} ({end - start} samples, inputs {start}-{end - 1})")
+    if output_file is not None:
+        shutil.copyfile(best["testbench"], output_file)
+        print(f"Minimal reproducer written to {output_file}")
+    best.update(start=start, end=end)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shrink a failing scenario to a minimal reproducer testbench")
+    parser.add_argument("excel_file", help="workbook holding the failing scenario")
+    parser.add_argument("--dut", nargs="+", required=True, help="VHDL sources of the design under test")
+    parser.add_argument("-s", "--order", type=int, choices=sorted(EXPECTED_ROLES), default=0, help="filter order S")
+    parser.add_argument("-o", "--output", default="minimal_testbench.vhd", help="minimal reproducer testbench")
+    parser.add_argument("--layout", default=DEFAULT_LAYOUT, help="layout file of the workbook")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="ghdl", help="simulator backend")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of parallel simulations (default: all cores)")
+    parser.add_argument("--std", default="08", help="VHDL standard (93, 02, 08, 19)")
+    parser.add_argument("--work-dir", default="shrink_work", help="directory of the candidate testbenches")
+    parser.add_argument("--cache-dir", default=None, help="simulation result cache directory")
+    args = parser.parse_args(argv)
+
+    result = shrink_scenario(args.excel_file, args.dut, args.order, args.output, args.layout, args.backend,
+                             args.jobs, {"std": args.std}, args.work_dir, args.cache_dir)
+    return 0 if result is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# This script keeps the outcome of past simulations, keyed by the content of the testbench, the DUT sources and the simulator options
+
+DEFAULT_CACHE_DIR = ".simulation_cache"
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024     # bytes
+
+# Options that do not change the outcome of a simulation that completed
+IGNORED_OPTIONS = ("timeout",)
+
+# Only conclusive outcomes are cached, errors may come from the environment (e.g. a missing simulator)
+CACHED_STATUSES = ("passed", "failed")
+
+
+def file_digest(file_name):
+    """Return the SHA-256 hex digest of a file content."""
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(testbench_file, dut_files, backend, options=None):
+    """
+    Build the cache key of a simulation from the hashes of the testbench and the DUT sources
+    (in analysis order) and from the simulator backend and options.
+    """
+    options = {name: value for name, value in (options or {}).items() if name not in IGNORED_OPTIONS}
+    key = hashlib.sha256()
+    key.update(f"testbench:{file_digest(testbench_file)}\n".encode())
+    for dut_file in dut_files:
+        key.update(f"dut:{file_digest(dut_file)}\n".encode())
+    key.update(f"backend:{backend}\n".encode())
+    key.update(f"options:{json.dumps(options, sort_keys=True, default=str)}\n".encode())
+    return key.hexdigest()
+
+
+def entry_file(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load_result(cache_dir, key):
+    """Return the cached result of a simulation, or None. A hit marks the entry as recently used."""
+    file_name = entry_file(cache_dir, key)
+    try:
+        with open(file_name, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        os.utime(file_name)
+    except (OSError, ValueError):
+        return None
+    return result
+
+
+def store_result(cache_dir, key, result, max_size=DEFAULT_CACHE_SIZE):
+    """Store the outcome and log of a conclusive simulation, then evict entries beyond the size cap."""
+    if result["status"] not in CACHED_STATUSES:
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = {name: result[name] for name in ("status", "message", "runtime", "log")}
+    entry["stored_at"] = time.time()
+
+    # Write to a temporary file first, concurrent readers never see a partial entry
+    fd, temp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(temp_file, entry_file(cache_dir, key))
+
+    evict_entries(cache_dir, max_size)
+    return True
+
+
+def evict_entries(cache_dir, max_size=DEFAULT_CACHE_SIZE):
+    """Delete the least recently used entries until the cache fits in max_size bytes. Return the number of deleted entries."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total_size = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, name in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        total_size -= size
+    return deleted
@@ -0,0 +1,10 @@
+import ReadFromExcelAndProduceTB3
+import ReadFromExcelAndProduceTB5
+
+# This script maps S to the testbench generator of the corresponding filter order, for the scripts handling both orders
+
+# S -> testbench generator and file name suffix of the corresponding filter order
+GENERATORS = {
+    0: (ReadFromExcelAndProduceTB3.generate_vhdl_testbench, "order3"),
+    1: (ReadFromExcelAndProduceTB5.generate_vhdl_testbench, "order5"),
+}
@@ -0,0 +1,102 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from ScenarioLayout import EXPECTED_ROLES, role_location
+
+# This script checks the data extracted from the Excel file before it is written into a VHDL testbench
+
+CONFIG_LENGTH = 14          # C1-C14
+MEMORY_SIZE = 65536         # 16-bit address space of the testbench RAM
+HEADER_LENGTH = 17          # K1, K2, S, C1-C14
+MAX_REPORTED_CELLS = 10     # Cells listed per kind of error, the rest is only counted
+
+
+def cell_names(sheet_name, column, first_row, indices):
+    """Turn positions inside a column into spreadsheet cell names such as Sheet2!C145."""
+    return [f"{sheet_name}!{column}{first_row + int(i)}" for i in indices]
+
+
+def describe_cells(problem, names):
+    """Build a single error line listing at most MAX_REPORTED_CELLS cells."""
+    listed = ", ".join(names[:MAX_REPORTED_CELLS])
+    if len(names) > MAX_REPORTED_CELLS:
+        listed += f" and {len(names) - MAX_REPORTED_CELLS} more"
+    return f"{len(names)} cell(s) {problem}: {listed}"
+
+
+def find_invalid_cells(values, sheet_name, column, first_row):
+    """
+    Check a column of values with whole-array operations: every cell must be
+    present, numeric, integer and in the 0-255 range of a memory byte.
+    Return a list of error messages naming the cells at fault.
+    """
+    values = pd.Series(values)
+    empty = values.isna().to_numpy()
+    numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+
+    not_numeric = np.isnan(numbers) & ~empty
+    finite = ~np.isnan(numbers)
+    not_integer = finite & (numbers != np.floor(numbers))
+    out_of_range = finite & ~not_integer & ((numbers < 0) | (numbers > 255))
+
+    errors = []
+    for problem, mask in (("are empty", empty),
+                          ("are not numbers", not_numeric),
+                          ("are not integers", not_integer),
+                          ("are outside 0-255", out_of_range)):
+        if mask.any():
+            errors.append(describe_cells(problem, cell_names(sheet_name, column, first_row, np.flatnonzero(mask))))
+    return errors
+
+
+def validate_scenario_data(config_values, input_values, output_values, locations, scenario_address=1234):
+    """
+    Validate the config header, input and expected output columns of a scenario.
+    `locations` maps "config", "input" and "output" to a (sheet_name, column, first_row) tuple,
+    where first_row is the spreadsheet row of the first value.
+    Return a list of error messages, empty if the data can be emitted safely.
+    """
+    start = time.perf_counter()
+    errors = []
+
+    for role, values in (("config", config_values), ("input", input_values), ("output", output_values)):
+        sheet_name, column, first_row = locations[role]
+        errors.extend(f"{role}: {message}" for message in find_invalid_cells(values, sheet_name, column, first_row))
+
+    if len(config_values) != CONFIG_LENGTH:
+        errors.append(f"config: expected {CONFIG_LENGTH} values (C1-C14), found {len(config_values)}")
+
+    if len(input_values) != len(output_values):
+        errors.append(f"length mismatch: {len(input_values)} input values but {len(output_values)} expected output values")
+
+    if len(input_values) == 0:
+        errors.append("input: the scenario is empty")
+    elif scenario_address + HEADER_LENGTH + 2 * len(input_values) > MEMORY_SIZE:
+        errors.append(f"input: a scenario of {len(input_values)} values at address {scenario_address} "
+                      f"does not fit in the {MEMORY_SIZE}-byte memory")
+
+    cells = len(config_values) + len(input_values) + len(output_values)
+    print(f"Validated {cells} cells in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return errors
+
+
+def validate_layout_data(layout, data, s, scenario_address=1234):
+    """
+    Validate the config header, input and expected output of S of the data read with a layout
+    (see ScenarioLayout.read_layout_data), naming the cells at fault from the layout.
+    """
+    role = EXPECTED_ROLES[s]
+    return validate_scenario_data(data["config"], data["input"], data[role], {
+        "config": role_location(layout, "config"),
+        "input": role_location(layout, "input"),
+        "output": role_location(layout, role),
+    }, scenario_address=scenario_address)
+
+
+def print_validation_errors(errors, heading="Invalid data found in the Excel file:"):
+    """Print the validation errors under a heading."""
+    print(heading)
+    for error in errors:
+        print(f"  {error}")
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import pickle
+import posixpath
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+from WorkbookSource import open_workbook_source
+
+# This script fingerprints only the parts of an xlsx archive the generator reads, so edits elsewhere do not force a reparse
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIP_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_RELATIONSHIP_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+DEFAULT_PARSE_CACHE_DIR = ".parse_cache"
+
+
+def resolve_part(target):
+    """Turn a relationship target of xl/workbook.xml into the name of the archive member."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def workbook_parts(archive, sheet_names):
+    """
+    Return the archive members holding the given sheets and the shared strings, found through
+    xl/workbook.xml and its relationships (sheet2.xml does not necessarily hold "Sheet2").
+    """
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    relationships = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel for rel in relationships.iter(f"{PACKAGE_RELATIONSHIP_NS}Relationship")}
+
+    parts = []
+    sheets = {sheet.get("name"): sheet.get(f"{RELATIONSHIP_NS}id") for sheet in workbook.iter(f"{MAIN_NS}sheet")}
+    for sheet_name in sheet_names:
+        if sheet_name not in sheets:
+            raise KeyError(f"Worksheet named '{sheet_name}' not found")
+        parts.append(resolve_part(targets[sheets[sheet_name]].get("Target")))
+
+    for rel in targets.values():
+        if rel.get("Type", "").endswith("/sharedStrings"):
+            parts.append(resolve_part(rel.get("Target")))
+    return parts
+
+
+def parts_fingerprint(archive, parts):
+    """Hash the CRC-32 and size recorded in the central directory for the given archive members."""
+    fingerprint = hashlib.sha256()
+    for part in parts:
+        info = archive.getinfo(part)
+        fingerprint.update(f"{part}:{info.CRC:08x}:{info.file_size}\n".encode())
+    return fingerprint.hexdigest()
+
+
+def workbook_fingerprint(excel_file, sheet_names):
+    """
+    Fingerprint the sheets and shared strings of an xlsx workbook from the CRC-32 and size recorded for them
+    in the central directory of the archive, without decompressing anything. Return None for workbooks
+    that are not zip archives (e.g. .xls), which cannot be fingerprinted part by part.
+    """
+    try:
+        with zipfile.ZipFile(open_workbook_source(excel_file)) as archive:
+            return parts_fingerprint(archive, workbook_parts(archive, sheet_names))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        return None
+
+
+def sheet_fingerprints(excel_file):
+    """
+    Return {sheet name: fingerprint} for every sheet of an xlsx workbook, in workbook order, each fingerprint
+    being the one workbook_fingerprint gives for that sheet alone. Only xl/workbook.xml and its relationships
+    are read. Return None for workbooks that are not zip archives.
+    """
+    try:
+        with zipfile.ZipFile(open_workbook_source(excel_file)) as archive:
+            workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+            sheet_names = [sheet.get("name") for sheet in workbook.iter(f"{MAIN_NS}sheet")]
+            parts = workbook_parts(archive, sheet_names)
+            # The sheet parts come first, followed by the shared strings every sheet depends on
+            shared_parts = parts[len(sheet_names):]
+            return {sheet_name: parts_fingerprint(archive, [part] + shared_parts)
+                    for sheet_name, part in zip(sheet_names, parts)}
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        return None
+
+
+def parse_cache_key(fingerprint, layout, roles):
+    """Key of the parsed data of a workbook: the fingerprint of its parts and the locations of the roles read."""
+    locations = {role: layout["roles"][role] for role in roles}
+    return hashlib.sha256(f"{fingerprint}\n{json.dumps(locations, sort_keys=True)}".encode()).hexdigest()
+
+
+def load_parsed_data(cache_dir, key):
+    """Return the parsed data stored under the key, or None."""
+    try:
+        with open(os.path.join(cache_dir, f"{key}.pkl"), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def store_parsed_data(cache_dir, key, data):
+    """Store the parsed data under the key, through a temporary file so readers never see a partial entry."""
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, os.path.join(cache_dir, f"{key}.pkl"))
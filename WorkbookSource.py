@@ -0,0 +1,67 @@
+import errno
+import io
+import mmap
+import os
+
+# This script lets the generator read a workbook from memory (bytes, buffers, open streams) instead of a file on disk
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only, seekable binary stream over a bytes-like object or mmap, without copying it."""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self.view = memoryview(buffer).cast("B")
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.view[self.position:self.position + len(b)]
+        size = len(data)
+        memoryview(b).cast("B")[:size] = data
+        self.position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = len(self.view) + offset
+        else:
+            raise ValueError(f"Invalid whence value: {whence}")
+        if position < 0:
+            # Same error as a file, which zipfile relies on to detect archives shorter than its end record
+            raise OSError(errno.EINVAL, "Negative seek position")
+        self.position = position
+        return self.position
+
+    def tell(self):
+        return self.position
+
+
+def is_path(source):
+    """Return True if the workbook source is a file name rather than an in-memory workbook."""
+    return isinstance(source, (str, os.PathLike))
+
+
+def open_workbook_source(source):
+    """
+    Return an object pandas.ExcelFile can read from a workbook source, which may be a path,
+    bytes, bytearray, memoryview, mmap or an already-open binary stream. Buffers are wrapped
+    without being copied, streams are rewound so they can be reused between calls.
+    """
+    if is_path(source):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return io.BufferedReader(BufferReader(source))
+    if hasattr(source, "read") and hasattr(source, "seek"):
+        source.seek(0)
+        return source
+    raise TypeError(f"Unsupported workbook source of type {type(source).__name__}")
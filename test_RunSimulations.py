@@ -0,0 +1,82 @@
+import RunSimulations
+from RunSimulations import parse_simulation_log, run_testbench, run_testbenches
+
+TESTBENCH = """entity project_tb is
+end project_tb;
+
+architecture project_tb_arch of project_tb is
+begin
+    assert false report "Simulation Ended! TEST PASSATO (EXAMPLE)" severity failure;
+end architecture;
+"""
+
+
+def write_testbench(tmp_path, name="tb.vhd", content=TESTBENCH):
+    testbench_file = tmp_path / name
+    testbench_file.write_text(content, encoding='utf-8')
+    return str(testbench_file)
+
+
+def test_fake_backend_pass(tmp_path):
+    result = run_testbench(write_testbench(tmp_path), [], backend="fake")
+    assert result["status"] == "passed"
+    assert result["message"].startswith("TEST PASSATO (EXAMPLE)")
+    assert not result["cached"]
+
+
+def test_fake_backend_fail(tmp_path):
+    result = run_testbench(write_testbench(tmp_path), [], backend="fake", options={"fake_outcome": "fail"})
+    assert result["status"] == "failed"
+    assert result["message"].startswith("TEST FALLITO @ OFFSET=17")
+
+
+def test_fake_backend_error(tmp_path):
+    result = run_testbench(write_testbench(tmp_path), [], backend="fake", options={"fake_outcome": "error"})
+    assert result["status"] == "error"
+    assert result["message"] == "analysis failed"
+
+
+def test_missing_entity(tmp_path):
+    result = run_testbench(write_testbench(tmp_path, content="-- no entity here\n"), [], backend="fake")
+    assert result["status"] == "error"
+    assert "No entity declaration" in result["message"]
+
+
+def test_parse_simulation_log():
+    assert parse_simulation_log("x\nfoo: TEST PASSATO (EXAMPLE)\n") == ("passed", "TEST PASSATO (EXAMPLE)")
+    # A failure wins over a pass reported later in the transcript
+    log = "a: TEST FALLITO @ OFFSET=20 expected= 1 actual=2\nb: TEST PASSATO"
+    assert parse_simulation_log(log) == ("failed", "TEST FALLITO @ OFFSET=20 expected= 1 actual=2")
+    assert parse_simulation_log("nothing reported")[0] == "error"
+
+
+def test_run_testbenches_keeps_order(tmp_path):
+    testbenches = [write_testbench(tmp_path, f"tb{i}.vhd") for i in range(4)]
+    results = run_testbenches(testbenches, [], backend="fake", jobs=2)
+    assert [r["testbench"] for r in results] == testbenches
+    assert all(r["status"] == "passed" for r in results)
+
+
+def test_cache_hit_on_second_run(tmp_path):
+    testbench_file = write_testbench(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+
+    first = run_testbench(testbench_file, [], backend="fake", cache_dir=cache_dir)
+    second = run_testbench(testbench_file, [], backend="fake", cache_dir=cache_dir)
+    assert first["status"] == second["status"] == "passed"
+    assert not first["cached"]
+    assert second["cached"]
+
+    # A changed testbench is simulated again
+    write_testbench(tmp_path, content=TESTBENCH.replace("(EXAMPLE)", "(CHANGED)"))
+    assert not run_testbench(testbench_file, [], backend="fake", cache_dir=cache_dir)["cached"]
+
+
+def test_main_with_cache_dir(tmp_path, capsys):
+    testbench_file = write_testbench(tmp_path)
+    arguments = [testbench_file, "--backend", "fake", "--cache-dir", str(tmp_path / "cache")]
+
+    assert RunSimulations.main(arguments) == 0
+    assert "0 cache hit(s)" in capsys.readouterr().out
+    assert RunSimulations.main(arguments) == 0
+    assert "1 cache hit(s)" in capsys.readouterr().out